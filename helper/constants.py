@@ -15,4 +15,116 @@ SF_TABLE_SCHEMA = "(incident_id INTEGER, date DATE, state STRING, city_or_county
                             participant_status_killed_freq INTEGER, participant_status_unharmed_freq INTEGER, participant_type_subject_suspect_freq INTEGER, participant_type_victim_freq INTEGER)"
 
 
-CLEANED_DATA_PATH = "data/gun_violence_cleaned_data_2013_2018.csv"
\ No newline at end of file
+CLEANED_DATA_PATH = "data/gun_violence_cleaned_data_2013_2018.csv"
+
+# Streaming ingest settings
+SF_INGEST_MAX_MEMORY_MB = 512
+SF_INGEST_QUEUE_DEPTH = 2
+SF_INGEST_SAMPLE_ROWS = 1000
+
+# Bulk (multi-file) load settings
+SF_BULK_MAX_WORKERS = 4
+
+# Parquet staging settings
+PARQUET_STAGE_DIR = "data/parquet/gva_cleaned_data"
+PARQUET_ROWS_PER_FILE = 100000
+PARQUET_COMPRESSION = "snappy"
+SF_PUT_PARALLEL = 8
+
+# Incremental (MERGE) load settings
+SF_INCREMENTAL_LOOKBACK_DAYS = 30
+SF_INCREMENTAL_CHUNK_ROWS = 100000
+
+# Compact pandas dtypes used when reading the cleaned data
+COMPACT_INT_TYPES = {
+    "incident_id": "Int32",
+    "congressional_district": "Int8",
+    "month": "Int8",
+    "day_of_week": "Int8",
+}
+DEFAULT_INT_TYPE = "Int16"
+DEFAULT_FLOAT_TYPE = "float32"
+CATEGORICAL_COLUMNS = ["state", "city_or_county"]
+DATE_FORMAT = "%Y-%m-%d"
+
+# Snowflake session pool settings
+SF_POOL_SIZE = 8
+SF_POOL_TIMEOUT = 60
+
+# Aggregate query result cache
+QUERY_CACHE_DIR = ".cache/queries"
+
+# Warehouse backend: "snowflake", or "duckdb" for the local stand-in warehouse
+WAREHOUSE_BACKEND = "snowflake"
+LOCAL_WAREHOUSE_PATH = "data/local_warehouse.duckdb"
+
+# LSTM forecasting service
+FORECAST_MODEL_DIR = "streamlit/models/time_series"
+FORECAST_INTERVALS = {
+    "monthly": {"ts": 12, "horizon": 12},
+    "weekly": {"ts": 7, "horizon": 52},
+    "daily": {"ts": 30, "horizon": 365},
+}
+FORECAST_SERVER_HOST = "127.0.0.1"
+FORECAST_SERVER_PORT = 8601
+FORECAST_SERVER_URL = f"http://{FORECAST_SERVER_HOST}:{FORECAST_SERVER_PORT}"
+FORECAST_MAX_BATCH_SIZE = 64
+FORECAST_MAX_WAIT_MS = 5
+FORECAST_MAX_HORIZON = 1000
+FORECAST_METRICS_WINDOW = 10000
+
+# Spark preprocessing pipeline
+RAW_DATA_PATH = "data/gun-violence-data_01-2013_03-2018.csv"
+CLEANED_PARQUET_DIR = "data/parquet/gva_cleaned_partitioned"
+CLEANED_PARTITION_COLUMNS = ["year"]
+SPARK_APP_NAME = "MIS548 Project PreProcessing"
+FREQ_ENCODER_CHUNK_ROWS = 100000
+
+# Incident clustering
+CLUSTER_FEATURES = [
+    "n_killed", "n_injured", "gun_stolen_not_stolen_freq", "gun_stolen_stolen_freq",
+    "gun_type_handgun_freq", "gun_type_rifle_freq", "participant_gender_female_freq",
+    "participant_gender_male_freq", "participant_status_killed_freq"
+]
+CLUSTER_PCA_COMPONENTS = 2
+CLUSTER_N_CLUSTERS = 8
+CLUSTER_K_RANGE = (1, 20)
+CLUSTER_BATCH_SIZE = 4096
+CLUSTER_RANDOM_STATE = 42
+CLUSTER_ASSIGN_CHUNK_ROWS = 100000
+CLUSTER_MODEL_DIR = "streamlit/models/clustering"
+
+# Severity and is_killed classification scoring
+SCORING_MODEL_DIR = "streamlit/models/classification"
+SCORING_BATCH_ROWS = 100000
+SCORING_VALIDATION_FRACTION = 0.2
+SCORING_RANDOM_STATE = 42
+
+# Geospatial incident index
+GEO_INDEX_DIR = "data/geo_index"
+GEO_MISSING_COORDINATE = -99.0
+GEO_GRID_DEGREES = 0.1
+GEO_HOTSPOT_FREQ = "M"
+
+# Memory-mapped columnar incident store
+INCIDENT_STORE_DIR = "data/store/gva_cleaned_data"
+INCIDENT_STORE_PARTITIONS = ["year", "state"]
+INCIDENT_STORE_CHUNK_ROWS = 100000
+
+# Logging and stage timing (overridden by the GVA_LOG_LEVEL and GVA_LOG_FORMAT environment variables)
+LOG_NAMESPACE = "gva"
+LOG_LEVEL = "INFO"
+LOG_FORMAT = "text"
+
+# Benchmark suite
+BENCHMARK_DATA_DIR = "data/benchmark"
+BENCHMARK_BASELINE_PATH = "benchmarks/baseline.json"
+BENCHMARK_RESULTS_PATH = "benchmarks/results.json"
+BENCHMARK_SIZES = [10000, 100000]
+BENCHMARK_CASES = ["get_data", "sink_write", "sink_stream", "forecast", "plots"]
+BENCHMARK_FORECAST_HORIZONS = [1, 12, 52, 365]
+BENCHMARK_FORECAST_REPEATS = 10
+BENCHMARK_GENERATE_CHUNK_ROWS = 500000
+BENCHMARK_DIRTY_FRACTION = 0.001
+BENCHMARK_TOLERANCE = 0.2
+BENCHMARK_SEED = 42
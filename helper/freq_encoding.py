@@ -0,0 +1,61 @@
+import helper.constants as CNT
+from helper.schema import parse_table_schema
+
+# Delimited ("0::Handgun||1::Rifle") columns that are one-hot frequency encoded into *_freq columns
+GUN_COLUMNS = ["gun_stolen", "gun_type"]
+PARTICIPANT_COLUMNS = ["participant_age_group", "participant_gender", "participant_status", "participant_type"]
+ENCODED_COLUMNS = GUN_COLUMNS + PARTICIPANT_COLUMNS
+
+# Entries such as "0::Unknown" are removed before encoding
+UNKNOWN_PATTERN = r"(\d+[:]{1,2}Unknown)(\|+)?"
+VALUE_DELIMITER = r"\|{1,2}"
+
+# Combined participant values counted towards each of their components
+FREQ_COMBINATIONS = {
+    "participant_status": {
+        "injured,_arrested": ["arrested", "injured"],
+        "killed,_arrested": ["arrested", "killed"],
+        "unharmed,_arrested": ["arrested", "unharmed"],
+        "killed,_injured": ["injured", "killed"],
+        "injured,_unharmed": ["injured", "unharmed"],
+        "injured,_unharmed,_arrested": ["injured"],
+        "killed,_unharmed": ["killed", "unharmed"],
+        "killed,_unharmed,_arrested": ["killed", "unharmed"],
+    },
+    "participant_gender": {
+        "male,_female": ["female", "male"],
+    },
+}
+
+def freq_targets(table_schema=CNT.SF_TABLE_SCHEMA):
+    """
+    Maps every normalized value of the encoded columns to the *_freq columns of the table schema it is
+    counted in. Values without a schema column (e.g. rare gun types) are not listed and not counted.
+
+    Args:
+        table_schema: The table schema string.
+
+    Returns:
+        Dictionary of source column to a dictionary of normalized value to a list of *_freq column names.
+    """
+    targets = {source_col: {} for source_col in ENCODED_COLUMNS}
+    # Longest prefix first, so that e.g. participant_age_group is not mistaken for a shorter column
+    prefixes = sorted(ENCODED_COLUMNS, key=len, reverse=True)
+    for name, _ in parse_table_schema(table_schema):
+        if not name.endswith("_freq"):
+            continue
+        source_col = next((prefix for prefix in prefixes if name.startswith(f"{prefix}_")), None)
+        if source_col is not None:
+            value = name[len(source_col) + 1:-len("_freq")]
+            targets[source_col].setdefault(value, []).append(name)
+
+    for source_col, combinations in FREQ_COMBINATIONS.items():
+        for combined, components in combinations.items():
+            targets[source_col][combined] = [f"{source_col}_{component}_freq" for component in components]
+    return targets
+
+def freq_columns(table_schema=CNT.SF_TABLE_SCHEMA):
+    """
+    Returns the *_freq columns of the table schema in table order.
+    """
+    return [name for name, _ in parse_table_schema(table_schema) if name.endswith("_freq")]
@@ -0,0 +1,151 @@
+import os
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+
+import helper.constants as CNT
+
+_HOOKS = []
+_HOOKS_LOCK = threading.Lock()
+
+def get_logger(name):
+    """
+    Returns the logger of a pipeline module, under the project's logger namespace.
+
+    Args:
+        name: Short module name, e.g. "snowflake_sink".
+
+    Returns:
+        A logging.Logger.
+    """
+    return logging.getLogger(f"{CNT.LOG_NAMESPACE}.{name}")
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Formats records as JSON lines. The fields of a stage record (stage, status, elapsed_s, nrows, ...)
+    are top-level keys, so production logs can be aggregated per stage.
+    """
+
+    def format(self, record):
+        entry = {"time": self.formatTime(record), "level": record.levelname, "logger": record.name,
+                 "message": record.getMessage()}
+        entry.update(getattr(record, "stage_record", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging(level=None, fmt=None):
+    """
+    Sends the project's log records to stderr. Called by the command line entry points; the GVA_LOG_LEVEL
+    and GVA_LOG_FORMAT environment variables override the defaults.
+
+    Args:
+        level: Log level name, defaults to LOG_LEVEL.
+        fmt: "text", or "json" for one structured record per line; defaults to LOG_FORMAT.
+    """
+    level = level or os.environ.get("GVA_LOG_LEVEL", CNT.LOG_LEVEL)
+    fmt = fmt or os.environ.get("GVA_LOG_FORMAT", CNT.LOG_FORMAT)
+    handler = logging.StreamHandler()
+    if fmt == "json":
+        handler.setFormatter(StructuredFormatter())
+    else:
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    logger = logging.getLogger(CNT.LOG_NAMESPACE)
+    logger.handlers = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+
+def add_timing_hook(hook):
+    """
+    Registers a function called with the record of every finished stage, e.g. to export stage timings
+    to a metrics system or to collect them in a benchmark.
+
+    Args:
+        hook: Function taking the stage record dictionary.
+    """
+    with _HOOKS_LOCK:
+        _HOOKS.append(hook)
+
+def remove_timing_hook(hook):
+    """
+    Unregisters a function added with `add_timing_hook`.
+    """
+    with _HOOKS_LOCK:
+        if hook in _HOOKS:
+            _HOOKS.remove(hook)
+
+@contextmanager
+def collect_stages():
+    """
+    Collects the records of the stages finished inside the block.
+
+    Returns:
+        Context manager yielding the list the records are appended to.
+    """
+    records = []
+    hook = records.append
+    add_timing_hook(hook)
+    try:
+        yield records
+    finally:
+        remove_timing_hook(hook)
+
+def _describe(record):
+    fields = " ".join(f"{key}={value:.0f}" if key == "rows_per_sec" else f"{key}={value}"
+                      for key, value in record.items() if key not in ("stage", "status", "elapsed_s"))
+    message = f"{record['stage']} {record['status']} in {record['elapsed_s']:.3f}s"
+    return f"{message} {fields}" if fields else message
+
+@contextmanager
+def stage(name, logger=None, level=logging.INFO, **fields):
+    """
+    Times a pipeline stage. The block may add fields to the yielded record; setting "nrows" also records
+    the throughput. On exit the record gets its status ("ok" or "error") and elapsed time, is logged as
+    one structured record and is passed to the timing hooks. Exceptions are recorded and re-raised.
+
+    Args:
+        name: Dotted stage name, e.g. "sink.get_data".
+        logger: Logger the record is written to, defaults to the namespace logger.
+        level: Log level of the record.
+        **fields: Initial fields of the record, e.g. the table name.
+
+    Returns:
+        Context manager yielding the record dictionary.
+    """
+    record = {"stage": name, **fields}
+    start = time.perf_counter()
+    try:
+        yield record
+        record["status"] = "ok"
+    except BaseException as e:
+        record["status"] = "error"
+        record["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        record["elapsed_s"] = time.perf_counter() - start
+        log_stage(record, logger, level)
+
+def log_stage(record, logger=None, level=logging.INFO):
+    """
+    Logs the record of a finished stage and passes it to the timing hooks. `stage` calls it on exit;
+    call it directly for a stage timed elsewhere, such as a load whose report already holds the elapsed time.
+
+    Args:
+        record: Dictionary with at least stage, status and elapsed_s; rows_per_sec is added if it has nrows.
+        logger: Logger the record is written to, defaults to the namespace logger.
+        level: Log level of the record.
+    """
+    if record.get("nrows") is not None:
+        record["rows_per_sec"] = record["nrows"] / max(record["elapsed_s"], 1e-9)
+    logger = logger or logging.getLogger(CNT.LOG_NAMESPACE)
+    if logger.isEnabledFor(level):
+        logger.log(level, _describe(record), extra={"stage_record": record})
+    with _HOOKS_LOCK:
+        hooks = list(_HOOKS)
+    for hook in hooks:
+        try:
+            hook(record)
+        except Exception as e:
+            logger.warning(f"Timing hook {hook!r} failed: {e}")
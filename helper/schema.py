@@ -0,0 +1,63 @@
+import re
+
+import helper.constants as CNT
+
+_COLUMN_PATTERN = re.compile(r"(\w+)\s+(\w+)")
+
+def parse_table_schema(table_schema=CNT.SF_TABLE_SCHEMA):
+    """
+    Parses a Snowflake table schema string such as "(incident_id INTEGER, date DATE, ...)"
+    into an ordered list of column definitions.
+
+    Args:
+        table_schema: The table schema string, defaults to the GVA cleaned data table schema.
+
+    Returns:
+        List of (column_name, sql_type) tuples in table order, with the type upper-cased.
+    """
+    body = table_schema.strip().lstrip("(").rstrip(")")
+    columns = []
+    for definition in body.split(","):
+        match = _COLUMN_PATTERN.search(definition)
+        if match:
+            columns.append((match.group(1), match.group(2).upper()))
+    return columns
+
+def columns_of_type(sql_type, table_schema=CNT.SF_TABLE_SCHEMA):
+    """
+    Returns the names of the schema columns declared with the given SQL type.
+
+    Args:
+        sql_type: SQL type name, e.g. "INTEGER".
+        table_schema: The table schema string.
+
+    Returns:
+        List of column names.
+    """
+    return [name for name, col_type in parse_table_schema(table_schema) if col_type == sql_type.upper()]
+
+def pandas_dtypes(table_schema=CNT.SF_TABLE_SCHEMA):
+    """
+    Maps the table schema to the compact pandas dtypes used when reading the cleaned data:
+    nullable integers sized per column, float32 coordinates and categoricals for low-cardinality text.
+
+    Args:
+        table_schema: The table schema string.
+
+    Returns:
+        Tuple (dtypes, date_columns): a dtype map for `pd.read_csv` and the list of DATE columns to parse.
+    """
+    dtypes = {}
+    date_columns = []
+    for name, sql_type in parse_table_schema(table_schema):
+        if sql_type == "DATE":
+            date_columns.append(name)
+        elif name in CNT.CATEGORICAL_COLUMNS:
+            dtypes[name] = "category"
+        elif sql_type == "INTEGER":
+            dtypes[name] = CNT.COMPACT_INT_TYPES.get(name, CNT.DEFAULT_INT_TYPE)
+        elif sql_type == "DOUBLE":
+            dtypes[name] = CNT.DEFAULT_FLOAT_TYPE
+        else:
+            dtypes[name] = "object"
+    return dtypes, date_columns
@@ -0,0 +1,184 @@
+import os
+import sys
+import hashlib
+import threading
+import pandas as pd
+import pyarrow.parquet as pq
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.schema import parse_table_schema
+from helper.instrumentation import get_logger
+
+LOGGER = get_logger("aggregate_queries")
+
+FREQ_COLUMNS = [name for name, _ in parse_table_schema() if name.endswith("_freq")]
+
+class QueryCache:
+    """
+    A local cache of query results keyed by the query text and the version of the table it reads.
+    Results are kept in memory and, if a directory is given, persisted as Parquet files so that
+    they survive restarts of dashboards and notebooks.
+    """
+
+    def __init__(self, cache_dir=CNT.QUERY_CACHE_DIR):
+        """
+        Initializes the cache.
+
+        Args:
+            cache_dir: Directory for persisted results, or None to cache in memory only.
+        """
+        self.cache_dir = cache_dir
+        self._memory = {}
+        self._lock = threading.Lock()
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def key(query, table_version):
+        """
+        Builds the cache key of a query against a given table version.
+        """
+        return hashlib.sha256(f"{table_version}\n{query}".encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Returns the cached Arrow table for `key`, or None.
+        """
+        with self._lock:
+            if key in self._memory:
+                return self._memory[key]
+        path = self._path(key)
+        if path and os.path.exists(path):
+            table = pq.read_table(path)
+            with self._lock:
+                self._memory[key] = table
+            return table
+        return None
+
+    def put(self, key, table):
+        """
+        Stores an Arrow table under `key`.
+        """
+        with self._lock:
+            self._memory[key] = table
+        path = self._path(key)
+        if path and table.num_columns:
+            pq.write_table(table, path)
+
+    def clear(self):
+        """
+        Drops every cached result, in memory and on disk.
+        """
+        with self._lock:
+            self._memory.clear()
+        if self.cache_dir:
+            for name in os.listdir(self.cache_dir):
+                if name.endswith(".parquet"):
+                    os.remove(os.path.join(self.cache_dir, name))
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.parquet") if self.cache_dir else None
+
+class IncidentAggregates:
+    """
+    Pushes the common incident aggregations down to Snowflake so that dashboards and notebooks
+    receive small aggregate results instead of the full table.
+    """
+
+    GROUP_COLUMNS = ["state", "year", "month", "day_of_week"]
+
+    def __init__(self, sf_connection, table=CNT.SF_TABLE_NAME, cache=None):
+        """
+        Initializes the query layer.
+
+        Args:
+            sf_connection: A connected SnowflakeConnector.
+            table: The incident table to aggregate.
+            cache: Optional QueryCache, a cache persisted in QUERY_CACHE_DIR is used by default.
+        """
+        self.sf_connection = sf_connection
+        self.table = table.upper()
+        self.cache = cache if cache is not None else QueryCache()
+
+    def table_version(self):
+        """
+        Returns the last modification time of the table, used to invalidate cached results.
+        """
+        return self.sf_connection.table_version(self.table)
+
+    def query(self, query, use_cache=True):
+        """
+        Runs a query and returns its result as an Arrow-backed DataFrame, serving it from the cache
+        when the same query has already run against the current table version.
+
+        Args:
+            query: The SQL query.
+            use_cache: Whether the cache is consulted and updated.
+
+        Returns:
+            A pandas DataFrame with pyarrow-backed columns and lower-case column names.
+        """
+        if use_cache:
+            key = QueryCache.key(query, self.table_version())
+            table = self.cache.get(key)
+            if table is None:
+                table = self.sf_connection.fetch_arrow(query)
+                self.cache.put(key, table)
+            else:
+                LOGGER.debug(f"Serving cached result for query: {query}")
+        else:
+            table = self.sf_connection.fetch_arrow(query)
+        result_df = table.to_pandas(types_mapper=pd.ArrowDtype)
+        result_df.columns = [col.lower() for col in result_df.columns]
+        return result_df
+
+    def _group_clause(self, group_by):
+        group_by = [group_by] if isinstance(group_by, str) else list(group_by or [])
+        unknown = [col for col in group_by if col not in self.GROUP_COLUMNS]
+        if unknown:
+            raise ValueError(f"Cannot group by {unknown}; supported columns are {self.GROUP_COLUMNS}.")
+        return [col.upper() for col in group_by]
+
+    def casualties(self, group_by=None, use_cache=True):
+        """
+        Counts incidents and sums n_killed and n_injured, optionally per group.
+
+        Args:
+            group_by: Optional column or list of columns among state, year, month and day_of_week.
+            use_cache: Whether the result cache is used.
+
+        Returns:
+            DataFrame with the group columns (if any), n_incidents, n_killed and n_injured.
+        """
+        group_cols = self._group_clause(group_by)
+        totals = "COUNT(*) AS N_INCIDENTS, SUM(N_KILLED) AS N_KILLED, SUM(N_INJURED) AS N_INJURED"
+        if group_cols:
+            select_cols = ", ".join(group_cols)
+            query = (f"SELECT {select_cols}, {totals} FROM {self.table} "
+                     f"GROUP BY {select_cols} ORDER BY {select_cols}")
+        else:
+            query = f"SELECT {totals} FROM {self.table}"
+        return self.query(query, use_cache)
+
+    def frequency_totals(self, group_by=None, use_cache=True):
+        """
+        Sums every participant and gun frequency column, optionally per group.
+
+        Args:
+            group_by: Optional column or list of columns among state, year, month and day_of_week.
+            use_cache: Whether the result cache is used.
+
+        Returns:
+            DataFrame with the group columns (if any) and one total per frequency column.
+        """
+        group_cols = self._group_clause(group_by)
+        sums = ", ".join(f"SUM({col.upper()}) AS {col.upper()}" for col in FREQ_COLUMNS)
+        if group_cols:
+            select_cols = ", ".join(group_cols)
+            query = (f"SELECT {select_cols}, {sums} FROM {self.table} "
+                     f"GROUP BY {select_cols} ORDER BY {select_cols}")
+        else:
+            query = f"SELECT {sums} FROM {self.table}"
+        return self.query(query, use_cache)
@@ -0,0 +1,492 @@
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import importlib.util
+import urllib.request
+import multiprocessing
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, where peak RSS is not reported
+    resource = None
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.schema import parse_table_schema
+from helper.instrumentation import get_logger, configure_logging, stage, collect_stages
+
+LOGGER = get_logger("benchmark")
+
+STATES = [
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware",
+    "District of Columbia", "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas",
+    "Kentucky", "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi",
+    "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", "New Jersey", "New Mexico", "New York",
+    "North Carolina", "North Dakota", "Ohio", "Oklahoma", "Oregon", "Pennsylvania", "Rhode Island",
+    "South Carolina", "South Dakota", "Tennessee", "Texas", "Utah", "Vermont", "Virginia", "Washington",
+    "West Virginia", "Wisconsin", "Wyoming",
+]
+CHARACTERISTICS = [
+    "Shot - Wounded/Injured", "Shot - Dead (murder, accidental, suicide)", "Non-Shooting Incident",
+    "Shots Fired - No Injuries", "Possession (gun(s) found during commission of other crimes)",
+    "Armed robbery with injury/death and/or evidence of DGU found", "Drug involvement", "Home Invasion",
+    "Officer Involved Incident", "Domestic Violence", "Gang involvement", "Drive-by (car to street, car to car)",
+]
+NOTES_WORDS = [
+    "man", "woman", "teen", "shot", "killed", "wounded", "police", "suspect", "arrested", "vehicle", "home",
+    "street", "apartment", "robbery", "argument", "party", "victim", "hospital", "fled", "scene", "found",
+    "handgun", "rifle", "night", "store", "parking", "lot", "officer", "domestic", "dispute",
+]
+DATE_RANGE = (np.datetime64("2013-01-01"), np.datetime64("2018-03-31"))
+
+def generate_chunk(nrows, first_id, rng, dirty_fraction=CNT.BENCHMARK_DIRTY_FRACTION):
+    """
+    Generates synthetic incidents with the columns and value distributions of the cleaned GVA data.
+    A fraction of the numeric values are unparseable, so that the type coercion is exercised too.
+
+    Args:
+        nrows: Number of incidents.
+        first_id: incident_id of the first incident.
+        rng: A numpy random Generator.
+        dirty_fraction: Fraction of n_guns_involved values written as "unknown".
+
+    Returns:
+        DataFrame with the SF_TABLE_SCHEMA columns in table order.
+    """
+    days = (DATE_RANGE[1] - DATE_RANGE[0]).astype(int)
+    dates = pd.DatetimeIndex(DATE_RANGE[0] + rng.integers(0, days + 1, nrows).astype("timedelta64[D]"))
+    latitude = rng.uniform(25.0, 49.0, nrows)
+    longitude = rng.uniform(-124.0, -67.0, nrows)
+    missing = rng.random(nrows) < 0.03
+    latitude[missing] = CNT.GEO_MISSING_COORDINATE
+    longitude[missing] = CNT.GEO_MISSING_COORDINATE
+    district = pd.array(rng.integers(0, 54, nrows), dtype="Int8")
+    district[rng.random(nrows) < 0.05] = pd.NA
+    n_guns = (rng.poisson(0.5, nrows) + 1).astype(str).astype(object)
+    n_guns[rng.random(nrows) < dirty_fraction] = "unknown"
+    # Two distinct characteristics per incident
+    first = rng.integers(0, len(CHARACTERISTICS), nrows)
+    second = (first + rng.integers(1, len(CHARACTERISTICS), nrows)) % len(CHARACTERISTICS)
+    characteristics = np.array(CHARACTERISTICS, dtype=object)
+    words = np.array(NOTES_WORDS, dtype=object)
+    notes = pd.Series(words[rng.integers(0, len(words), nrows)])
+    for _ in range(7):
+        notes = notes + " " + words[rng.integers(0, len(words), nrows)]
+
+    columns = {
+        "incident_id": np.arange(first_id, first_id + nrows),
+        "date": dates.strftime(CNT.DATE_FORMAT),
+        "state": rng.choice(STATES, nrows),
+        "city_or_county": np.char.add("City ", rng.integers(0, 5000, nrows).astype(str)),
+        "address": np.char.add(rng.integers(1, 9999, nrows).astype(str), " Main St"),
+        "n_killed": rng.poisson(0.25, nrows),
+        "n_injured": rng.poisson(0.5, nrows),
+        "congressional_district": district,
+        "incident_characteristics": characteristics[first] + " || " + characteristics[second],
+        "latitude": latitude.round(4),
+        "longitude": longitude.round(4),
+        "n_guns_involved": n_guns,
+        "notes": notes.to_numpy(),
+        "year": dates.year,
+        "month": dates.month,
+        "day_of_week": dates.dayofweek,
+    }
+    for name, _ in parse_table_schema():
+        if name.endswith("_freq"):
+            columns[name] = rng.poisson(0.3, nrows)
+    return pd.DataFrame({name: columns[name] for name, _ in parse_table_schema()})
+
+def ensure_dataset(nrows, data_dir=CNT.BENCHMARK_DATA_DIR, seed=CNT.BENCHMARK_SEED,
+                   chunk_rows=CNT.BENCHMARK_GENERATE_CHUNK_ROWS):
+    """
+    Returns the path of a synthetic data CSV of `nrows` incidents, generating it chunk by chunk if it does
+    not exist yet. Files are deterministic for a size and seed, so repeated runs reuse them.
+
+    Args:
+        nrows: Number of incidents, e.g. 10_000 to 10_000_000.
+        data_dir: Directory of the generated files.
+        seed: Seed of the generator.
+        chunk_rows: Number of incidents generated and written at a time.
+
+    Returns:
+        Path of the CSV.
+    """
+    path = os.path.join(data_dir, f"synthetic_{nrows}_{seed}.csv")
+    if os.path.exists(path):
+        return path
+    os.makedirs(data_dir, exist_ok=True)
+    partial_path = f"{path}.partial"
+    writer = schema = None
+    with stage("benchmark.generate", LOGGER, path=path) as record:
+        try:
+            for chunk_index, start in enumerate(range(0, nrows, chunk_rows)):
+                rng = np.random.default_rng([seed, chunk_index])
+                chunk_df = generate_chunk(min(chunk_rows, nrows - start), start + 1, rng)
+                # Arrow's CSV writer is an order of magnitude faster than DataFrame.to_csv at these sizes
+                table = pa.Table.from_pandas(chunk_df, schema=schema, preserve_index=False)
+                if writer is None:
+                    schema = table.schema
+                    writer = pa_csv.CSVWriter(partial_path, schema)
+                writer.write_table(table)
+        finally:
+            if writer is not None:
+                writer.close()
+        record["nrows"] = nrows
+    os.replace(partial_path, path)
+    return path
+
+def _setup_get_data(path, options):
+    from scripts.local_warehouse import DuckDBConnector
+    from scripts.snowflake_sink import SnowFlakeSink
+
+    connector = DuckDBConnector(":memory:")
+    connector.connect()
+    sink = SnowFlakeSink(connector)
+
+    def run():
+        data_df = sink.get_data(path)
+        if data_df is None:
+            raise RuntimeError(f"get_data failed for {path}")
+        return len(data_df)
+    return run
+
+def _setup_sink(path, options, stream):
+    from scripts.local_warehouse import DuckDBConnector
+    from scripts.snowflake_sink import SnowFlakeSink
+
+    connector = DuckDBConnector(os.path.join(options["work_dir"], f"warehouse_{os.getpid()}.duckdb"))
+    connector.connect()
+    connector.create_table(CNT.SF_WAREHOUSE, CNT.SF_DATABASE, CNT.SF_SCHEMA, CNT.SF_TABLE_NAME,
+                           CNT.SF_TABLE_SCHEMA)
+    sink = SnowFlakeSink(connector)
+
+    def run():
+        if stream:
+            report = sink.write_table_streaming(path, CNT.SF_TABLE_NAME, max_memory_mb=options["max_memory_mb"])
+        else:
+            report = sink.write_table(path, CNT.SF_TABLE_NAME)
+        if not report["success"]:
+            raise RuntimeError(f"Loading {path} into the local warehouse failed")
+        return report["nrows"]
+    return run
+
+def _setup_plots(path, options):
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from scripts.typed_reader import read_typed_csv
+    from scripts.visualizations import Visualization
+
+    data_df = read_typed_csv(path)
+    panels = [
+        ("bar_plot", lambda viz, ax: viz.bar_plot(ax, "state")),
+        ("dist_plot", lambda viz, ax: viz.dist_plot(ax, "n_injured")),
+        ("box_plot", lambda viz, ax: viz.box_plot(ax, "n_killed")),
+        ("scatter_plot", lambda viz, ax: viz.scatter_plot(ax, "longitude", "latitude")),
+        ("word_cloud", lambda viz, ax: viz.word_cloud(ax, "notes")),
+    ]
+
+    def run():
+        # A new Visualization per run, so the cached aggregates are recomputed
+        viz = Visualization(data_df)
+        for name, draw in panels:
+            with stage(f"plot.{name}", LOGGER):
+                fig, ax = plt.subplots(figsize=(10, 8))
+                draw(viz, ax)
+                fig.savefig(io.BytesIO(), format="png")
+                plt.close(fig)
+        with stage("plot.time_series_plot", LOGGER):
+            viz.time_series_plot("date", ["n_killed", "n_injured"])
+            plt.gcf().savefig(io.BytesIO(), format="png")
+            plt.close("all")
+        return len(data_df)
+    return run
+
+def _setup_forecast(param, options):
+    interval, horizon = param
+    ts = CNT.FORECAST_INTERVALS[interval]["ts"]
+    window = np.zeros(ts, dtype=np.float32)
+    if options["forecast_url"]:
+        # The request predict_future in streamlit/app.py sends to the forecasting service
+        payload = json.dumps({"window": window.tolist(), "horizon": horizon, "scaled": True}).encode("utf-8")
+        url = f"{options['forecast_url']}/forecast/{interval}"
+
+        def predict():
+            request = urllib.request.Request(url, data=payload, headers={"Content-Type": "application/json"})
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return json.loads(response.read())["predictions"]
+    else:
+        import joblib
+        from tensorflow.keras.models import load_model
+        from scripts.forecast_engine import LSTMRollout
+
+        model_dir = options["model_dir"]
+        engine = LSTMRollout(load_model(os.path.join(model_dir, f"lstm_model_{interval}.h5")),
+                             joblib.load(os.path.join(model_dir, f"scaler_{interval}.pkl")), ts)
+
+        def predict():
+            return engine.rollout(window[None, :], horizon)
+
+    # Traces the tf.function (or opens the connection) before timing
+    predict()
+
+    def run():
+        for _ in range(options["repeats"]):
+            with stage("forecast.predict", LOGGER, interval=interval, horizon=horizon):
+                predict()
+        return horizon * options["repeats"]
+    return run
+
+CASES = {
+    "get_data": _setup_get_data,
+    "sink_write": lambda path, options: _setup_sink(path, options, stream=False),
+    "sink_stream": lambda path, options: _setup_sink(path, options, stream=True),
+    "forecast": _setup_forecast,
+    "plots": _setup_plots,
+}
+
+def _peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes on Linux
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+def measure(case, param, options):
+    """
+    Runs one benchmark case in the current process and measures it. Only the case's run is timed, its
+    setup (loading data or a model, connecting) is not; the peak RSS is the process high-water mark,
+    which is why `run_benchmarks` runs every case in a fresh process.
+
+    Args:
+        case: Name of a case in CASES.
+        param: Path of the data file, or (interval, horizon) for the forecast case.
+        options: Dictionary of the run options (work_dir, max_memory_mb, model_dir, forecast_url, repeats).
+
+    Returns:
+        Dictionary with rows, wall_s, rows_per_sec, peak_rss_mb and the time spent per stage.
+    """
+    configure_logging(options["log_level"])
+    run = CASES[case](param, options)
+    with collect_stages() as records:
+        start = time.perf_counter()
+        rows = run()
+        wall = time.perf_counter() - start
+    stages = {}
+    for record in records:
+        totals = stages.setdefault(record["stage"], {"count": 0, "elapsed_s": 0.0})
+        totals["count"] += 1
+        totals["elapsed_s"] += record["elapsed_s"]
+    return {"rows": rows, "wall_s": wall, "rows_per_sec": rows / max(wall, 1e-9), "peak_rss_mb": _peak_rss_mb(),
+            "stages": stages}
+
+def available_forecasts(options, horizons=CNT.BENCHMARK_FORECAST_HORIZONS):
+    """
+    Lists the (interval, horizon) pairs the forecast case can run: every interval served at
+    `forecast_url`, or with model files in `model_dir` if TensorFlow is installed.
+    """
+    if options["forecast_url"]:
+        intervals = list(CNT.FORECAST_INTERVALS)
+    elif importlib.util.find_spec("tensorflow") is None:
+        LOGGER.warning("Skipping the forecast case, TensorFlow is not installed.")
+        return []
+    else:
+        intervals = [name for name in CNT.FORECAST_INTERVALS
+                     if os.path.exists(os.path.join(options["model_dir"], f"lstm_model_{name}.h5"))]
+    return [(interval, horizon) for interval in intervals for horizon in horizons]
+
+def run_benchmarks(cases=CNT.BENCHMARK_CASES, sizes=CNT.BENCHMARK_SIZES, data_dir=CNT.BENCHMARK_DATA_DIR,
+                   horizons=CNT.BENCHMARK_FORECAST_HORIZONS, repeats=CNT.BENCHMARK_FORECAST_REPEATS,
+                   max_memory_mb=CNT.SF_INGEST_MAX_MEMORY_MB, model_dir=CNT.FORECAST_MODEL_DIR,
+                   forecast_url=None, log_level="WARNING"):
+    """
+    Runs the benchmark cases, each in its own fresh process so that its peak RSS is its own.
+    The data cases run once per dataset size, the forecast case once per interval and horizon.
+
+    Args:
+        cases: Names of the cases to run.
+        sizes: Numbers of rows of the synthetic datasets.
+        data_dir: Directory of the synthetic datasets.
+        horizons: Forecast horizons, in steps.
+        repeats: Number of timed forecasts per interval and horizon.
+        max_memory_mb: Memory ceiling of the streaming sink case.
+        model_dir: Directory of the LSTM models.
+        forecast_url: Optional URL of a running forecasting service; the forecast case then times the
+                      HTTP round trip of predict_future instead of the in-process rollout.
+        log_level: Log level inside the benchmarked processes.
+
+    Returns:
+        Dictionary of result name (e.g. "get_data[100000]") to result, holding "error" if the case failed.
+    """
+    work_dir = tempfile.mkdtemp(prefix="gva_benchmark_")
+    options = {"work_dir": work_dir, "max_memory_mb": max_memory_mb, "model_dir": model_dir,
+               "forecast_url": forecast_url, "repeats": repeats, "log_level": log_level}
+    plan = []
+    for case in cases:
+        if case == "forecast":
+            plan += [(f"forecast[{interval},h={horizon}]", case, (interval, horizon))
+                     for interval, horizon in available_forecasts(options, horizons)]
+        else:
+            plan += [(f"{case}[{nrows}]", case, ensure_dataset(nrows, data_dir)) for nrows in sizes]
+
+    results = {}
+    spawn = multiprocessing.get_context("spawn")
+    try:
+        for name, case, param in plan:
+            LOGGER.info(f"Running {name}...")
+            try:
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                    results[name] = executor.submit(measure, case, param, options).result()
+            except Exception as e:
+                LOGGER.error(f"Benchmark {name} failed: {e}")
+                results[name] = {"error": f"{type(e).__name__}: {e}"}
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+def machine_info():
+    """
+    Describes the machine the benchmarks ran on, stored with the baseline.
+    """
+    return {"platform": platform.platform(), "python": platform.python_version(), "cpus": os.cpu_count()}
+
+def load_baseline(path=CNT.BENCHMARK_BASELINE_PATH):
+    """
+    Loads the stored baseline, or returns None if there is none.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path) as baseline_file:
+        return json.load(baseline_file)
+
+def save_baseline(results, path=CNT.BENCHMARK_BASELINE_PATH):
+    """
+    Stores the successful results as the new baseline, keeping the baseline of the cases not run.
+    """
+    baseline = load_baseline(path) or {"results": {}}
+    baseline["machine"] = machine_info()
+    baseline["updated"] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+    baseline["results"].update({name: {key: result[key] for key in ("wall_s", "peak_rss_mb", "rows_per_sec")}
+                                for name, result in results.items() if "error" not in result})
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as baseline_file:
+        json.dump(baseline, baseline_file, indent=2, sort_keys=True)
+    LOGGER.info(f"Baseline of {len(baseline['results'])} results written to {path}")
+
+def compare_to_baseline(results, baseline, tolerance=CNT.BENCHMARK_TOLERANCE):
+    """
+    Compares the results to the baseline. A result regressed if its wall time or its peak RSS grew by
+    more than `tolerance` (0.2 is 20%).
+
+    Args:
+        results: Results returned by `run_benchmarks`.
+        baseline: Baseline loaded with `load_baseline`.
+        tolerance: Allowed relative growth.
+
+    Returns:
+        Dictionary of result name to {"wall_change", "rss_change", "regression"}, for the results in the baseline.
+    """
+    comparison = {}
+    for name, result in results.items():
+        reference = baseline["results"].get(name)
+        if reference is None or "error" in result:
+            continue
+        changes = {}
+        for metric, key in (("wall_s", "wall_change"), ("peak_rss_mb", "rss_change")):
+            if result.get(metric) is not None and reference.get(metric):
+                changes[key] = result[metric] / reference[metric] - 1
+        changes["regression"] = any(change > tolerance for change in changes.values())
+        comparison[name] = changes
+    return comparison
+
+def format_report(results, comparison, baseline_path=None):
+    """
+    Formats the results, and their change against the baseline, as a table.
+
+    Args:
+        results: Results returned by `run_benchmarks`.
+        comparison: Comparison returned by `compare_to_baseline`, or None if there is no baseline.
+        baseline_path: Path of the baseline, named in the report when there is none.
+    """
+    lines = [f"{'case':32} {'rows':>10} {'wall_s':>9} {'rows/sec':>12} {'peak_rss_mb':>12}  vs baseline"]
+    for name, result in results.items():
+        if "error" in result:
+            lines.append(f"{name:32} FAILED: {result['error']}")
+            continue
+        peak = f"{result['peak_rss_mb']:.1f}" if result["peak_rss_mb"] is not None else "n/a"
+        change = comparison.get(name) if comparison is not None else None
+        if comparison is None:
+            versus = "no baseline"
+        elif change is None:
+            versus = "new"
+        else:
+            versus = ", ".join(f"{key.split('_')[0]} {value:+.1%}" for key, value in change.items()
+                               if key != "regression")
+            if change["regression"]:
+                versus += "  REGRESSION"
+        lines.append(f"{name:32} {result['rows']:>10} {result['wall_s']:>9.3f} {result['rows_per_sec']:>12.0f} "
+                     f"{peak:>12}  {versus}")
+    if comparison is None:
+        lines.append(f"No baseline at {baseline_path}, nothing was compared; run with --save-baseline to record one.")
+    return "\n".join(lines)
+
+def parse_args():
+    """
+    Parses the command line arguments of the benchmark suite.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks the ingest, forecast and plotting hot paths "
+                                                 "on synthetic GVA-shaped data.")
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=CNT.BENCHMARK_CASES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=CNT.BENCHMARK_SIZES,
+                        help="Rows of the synthetic datasets, e.g. 10000 1000000 10000000")
+    parser.add_argument("--data-dir", default=CNT.BENCHMARK_DATA_DIR)
+    parser.add_argument("--horizons", nargs="+", type=int, default=CNT.BENCHMARK_FORECAST_HORIZONS)
+    parser.add_argument("--repeats", type=int, default=CNT.BENCHMARK_FORECAST_REPEATS)
+    parser.add_argument("--max-memory-mb", type=int, default=CNT.SF_INGEST_MAX_MEMORY_MB,
+                        help="Memory ceiling of the streaming sink case")
+    parser.add_argument("--model-dir", default=CNT.FORECAST_MODEL_DIR)
+    parser.add_argument("--forecast-url", default=None,
+                        help="Time predict_future requests against a running forecasting service")
+    parser.add_argument("--baseline", default=CNT.BENCHMARK_BASELINE_PATH)
+    parser.add_argument("--output", default=CNT.BENCHMARK_RESULTS_PATH, help="JSON file the results are written to")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=CNT.BENCHMARK_TOLERANCE)
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with status 1 on a regression")
+    parser.add_argument("--log-level", default="WARNING", help="Log level inside the benchmarked processes")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging()
+    results = run_benchmarks(args.cases, args.sizes, args.data_dir, args.horizons, args.repeats,
+                             args.max_memory_mb, args.model_dir, args.forecast_url, args.log_level)
+
+    baseline = load_baseline(args.baseline)
+    if baseline is not None and baseline.get("machine") != machine_info():
+        LOGGER.warning(f"The baseline was recorded on another machine: {baseline.get('machine')}")
+    comparison = compare_to_baseline(results, baseline, args.tolerance) if baseline else None
+    print(format_report(results, comparison, args.baseline))
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as output_file:
+        json.dump({"machine": machine_info(), "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                   "results": results, "comparison": comparison}, output_file, indent=2)
+    if args.save_baseline:
+        save_baseline(results, args.baseline)
+    if args.fail_on_regression and comparison is None:
+        LOGGER.warning(f"--fail-on-regression has no effect without a baseline at {args.baseline}")
+    if args.fail_on_regression and any(change["regression"] for change in (comparison or {}).values()):
+        sys.exit(1)
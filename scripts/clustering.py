@@ -0,0 +1,276 @@
+import os
+import sys
+import json
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler
+from sklearn.decomposition import PCA
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import pairwise_distances_argmin_min
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.instrumentation import get_logger, configure_logging, stage
+from scripts.incident_store import read_incidents, iter_incidents
+
+LOGGER = get_logger("clustering")
+
+def _fit_kmeans(X, n_clusters, init, batch_size, random_state):
+    kmeans = MiniBatchKMeans(n_clusters=n_clusters, init=init, n_init=1 if not isinstance(init, str) else 3,
+                             batch_size=batch_size, random_state=random_state)
+    return kmeans.fit(X)
+
+def _sweep_block(X, k_values, batch_size, random_state):
+    """
+    Fits MiniBatchKMeans for a contiguous block of k values. Each k after the first is warm-started from
+    the previous solution's centroids plus the point farthest from its centroid.
+
+    Returns:
+        List of (k, inertia, centroids) tuples.
+    """
+    results = []
+    centroids = None
+    for k in k_values:
+        if centroids is None or len(centroids) != k - 1:
+            init = "k-means++"
+        else:
+            _, distances = pairwise_distances_argmin_min(X, centroids)
+            init = np.vstack([centroids, X[np.argmax(distances)]])
+        kmeans = _fit_kmeans(X, k, init, batch_size, random_state)
+        centroids = kmeans.cluster_centers_
+        results.append((k, float(kmeans.inertia_), centroids))
+    return results
+
+class IncidentClusterer:
+    """
+    Clusters incidents on a standardized PCA projection of their casualty, gun and participant features
+    with mini-batch k-means. The fitted scaler, PCA and k-means model are persisted, and new incidents are
+    labelled in bulk with a fused affine projection and nearest-centroid search, without refitting.
+    """
+
+    def __init__(self, features=CNT.CLUSTER_FEATURES, n_components=CNT.CLUSTER_PCA_COMPONENTS,
+                 batch_size=CNT.CLUSTER_BATCH_SIZE, random_state=CNT.CLUSTER_RANDOM_STATE):
+        """
+        Initializes an unfitted clusterer.
+
+        Args:
+            features: Columns of the cleaned data used as features.
+            n_components: Number of PCA components the clusters are fitted on.
+            batch_size: Mini-batch size of the k-means updates.
+            random_state: Seed of the k-means initialization and mini-batch sampling.
+        """
+        self.features = list(features)
+        self.n_components = n_components
+        self.batch_size = batch_size
+        self.random_state = random_state
+        self.scaler = None
+        self.pca = None
+        self.kmeans = None
+        self.sweep = {}
+
+    def feature_matrix(self, data_df):
+        """
+        Extracts the feature columns as a float64 array, with missing counts treated as 0.
+        """
+        return data_df[self.features].astype("float64").fillna(0).to_numpy()
+
+    def fit_projection(self, data_df):
+        """
+        Fits the scaler and PCA on the incidents and returns their projection.
+
+        Args:
+            data_df: DataFrame of the cleaned data holding the feature columns.
+
+        Returns:
+            Array of shape (n_incidents, n_components).
+        """
+        X = self.feature_matrix(data_df)
+        self.scaler = StandardScaler().fit(X)
+        self.pca = PCA(n_components=self.n_components).fit(self.scaler.transform(X))
+        return self.project(X)
+
+    def project(self, X):
+        """
+        Projects a feature array onto the fitted PCA components in one affine transform, folding the
+        standardization into the projection matrix.
+        """
+        weights = (self.pca.components_ / self.scaler.scale_).T
+        offset = (self.scaler.mean_ / self.scaler.scale_ + self.pca.mean_) @ self.pca.components_.T
+        return X @ weights - offset
+
+    def sweep_k(self, X_proj, k_values=None, max_workers=None):
+        """
+        Fits k-means for every k in `k_values` to pick the number of clusters (elbow method). The k values
+        are split into contiguous blocks fitted in parallel processes, each k warm-started from the
+        solution for k - 1 in its block.
+
+        Args:
+            X_proj: Projected incidents, as returned by `fit_projection`.
+            k_values: The k values to evaluate, defaults to CLUSTER_K_RANGE.
+            max_workers: Number of worker processes, defaults to the number of CPUs.
+
+        Returns:
+            Dictionary of k to inertia (within-cluster sum of squares).
+        """
+        if k_values is None:
+            k_values = range(CNT.CLUSTER_K_RANGE[0], CNT.CLUSTER_K_RANGE[1] + 1)
+        k_values = sorted(k_values)
+        max_workers = min(max_workers or os.cpu_count() or 1, len(k_values))
+        blocks = [block.tolist() for block in np.array_split(k_values, max_workers) if len(block)]
+
+        with stage("clustering.sweep", LOGGER, k_min=k_values[0], k_max=k_values[-1], workers=max_workers):
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = [executor.submit(_sweep_block, X_proj, block, self.batch_size, self.random_state)
+                           for block in blocks]
+                results = [result for future in futures for result in future.result()]
+        self.sweep = {k: inertia for k, inertia, _ in results}
+        return self.sweep
+
+    def fit(self, data_df, n_clusters=CNT.CLUSTER_N_CLUSTERS, sweep=False, max_workers=None):
+        """
+        Fits the scaler, PCA and k-means on the incidents.
+
+        Args:
+            data_df: DataFrame of the cleaned data holding the feature columns.
+            n_clusters: Number of clusters.
+            sweep: Whether the k sweep is evaluated as well, stored in `self.sweep`.
+            max_workers: Number of worker processes of the sweep.
+
+        Returns:
+            The cluster label of every incident.
+        """
+        X_proj = self.fit_projection(data_df)
+        if sweep:
+            self.sweep_k(X_proj, max_workers=max_workers)
+        self.kmeans = _fit_kmeans(X_proj, n_clusters, "k-means++", self.batch_size, self.random_state)
+        return self.kmeans.labels_
+
+    def partial_fit(self, data_df):
+        """
+        Updates the centroids with a chunk of new incidents, keeping the fitted scaler and PCA.
+
+        Args:
+            data_df: DataFrame of new incidents holding the feature columns.
+        """
+        self.kmeans.partial_fit(self.project(self.feature_matrix(data_df)))
+        return self
+
+    def assign_clusters(self, data, chunk_size=CNT.CLUSTER_ASSIGN_CHUNK_ROWS):
+        """
+        Labels incidents with their nearest centroid, chunk by chunk to bound memory.
+
+        Args:
+            data: DataFrame holding the feature columns, or a feature array in `features` order.
+            chunk_size: Number of incidents labelled per chunk.
+
+        Returns:
+            Array of int32 cluster labels.
+        """
+        X = self.feature_matrix(data) if isinstance(data, pd.DataFrame) else np.asarray(data, dtype=np.float64)
+        centroids = self.kmeans.cluster_centers_
+        centroid_norms = (centroids ** 2).sum(axis=1)
+        labels = np.empty(len(X), dtype=np.int32)
+        for start in range(0, len(X), chunk_size):
+            X_proj = self.project(X[start:start + chunk_size])
+            # argmin ||x - c||^2 = argmin (||c||^2 - 2 x.c), ||x||^2 is the same for every centroid
+            labels[start:start + chunk_size] = np.argmin(centroid_norms - 2 * X_proj @ centroids.T, axis=1)
+        return labels
+
+    def summary(self, data_df, labels):
+        """
+        Returns the mean of every feature per cluster.
+        """
+        return data_df[self.features].groupby(pd.Series(labels, index=data_df.index, name="cluster")).mean()
+
+    def save(self, model_dir=CNT.CLUSTER_MODEL_DIR):
+        """
+        Persists the scaler, PCA and k-means model (holding the centroids) with the model settings.
+
+        Args:
+            model_dir: Directory to write scaler.pkl, pca.pkl, kmeans.pkl and clustering.json to.
+        """
+        os.makedirs(model_dir, exist_ok=True)
+        joblib.dump(self.scaler, os.path.join(model_dir, "scaler.pkl"))
+        joblib.dump(self.pca, os.path.join(model_dir, "pca.pkl"))
+        joblib.dump(self.kmeans, os.path.join(model_dir, "kmeans.pkl"))
+        metadata = {"features": self.features, "n_components": self.n_components, "batch_size": self.batch_size,
+                    "random_state": self.random_state, "n_clusters": int(self.kmeans.n_clusters),
+                    "centroids": self.kmeans.cluster_centers_.tolist(),
+                    "sweep": {str(k): inertia for k, inertia in self.sweep.items()}}
+        with open(os.path.join(model_dir, "clustering.json"), "w") as f:
+            json.dump(metadata, f, indent=2)
+        LOGGER.info(f"Saved the clustering model to {model_dir}.")
+
+    @classmethod
+    def load(cls, model_dir=CNT.CLUSTER_MODEL_DIR):
+        """
+        Loads a clusterer persisted with `save`.
+        """
+        with open(os.path.join(model_dir, "clustering.json")) as f:
+            metadata = json.load(f)
+        clusterer = cls(metadata["features"], metadata["n_components"], metadata["batch_size"],
+                        metadata["random_state"])
+        clusterer.scaler = joblib.load(os.path.join(model_dir, "scaler.pkl"))
+        clusterer.pca = joblib.load(os.path.join(model_dir, "pca.pkl"))
+        clusterer.kmeans = joblib.load(os.path.join(model_dir, "kmeans.pkl"))
+        clusterer.sweep = {int(k): inertia for k, inertia in metadata["sweep"].items()}
+        return clusterer
+
+def assign_file(clusterer, path, output_path, chunk_size=CNT.CLUSTER_ASSIGN_CHUNK_ROWS):
+    """
+    Labels every incident of the cleaned data, reading only the feature columns chunk by chunk.
+
+    Args:
+        clusterer: A fitted IncidentClusterer.
+        path: Path of the cleaned data CSV or of an incident store.
+        output_path: Path of the CSV of incident_id and cluster to write.
+        chunk_size: Number of rows per chunk.
+
+    Returns:
+        Number of incidents labelled.
+    """
+    nrows = 0
+    usecols = ["incident_id"] + clusterer.features
+    with stage("clustering.assign", LOGGER, path=path) as record:
+        for chunk_df in iter_incidents(path, usecols, chunk_size):
+            labels_df = pd.DataFrame({"incident_id": chunk_df["incident_id"],
+                                      "cluster": clusterer.assign_clusters(chunk_df, chunk_size)})
+            labels_df.to_csv(output_path, mode="a" if nrows else "w", header=not nrows, index=False)
+            nrows += len(chunk_df)
+        record["nrows"] = nrows
+    return nrows
+
+def parse_args():
+    """
+    Parses the command line arguments of the clustering module.
+    """
+    parser = argparse.ArgumentParser(description="Fits the incident clusters or assigns incidents to them.")
+    parser.add_argument("command", choices=["fit", "assign"],
+                        help="fit: fit and persist the clusters; assign: label the incidents of a CSV.")
+    parser.add_argument("--source", default=CNT.CLEANED_DATA_PATH, help="Cleaned data CSV or incident store.")
+    parser.add_argument("--model-dir", default=CNT.CLUSTER_MODEL_DIR)
+    parser.add_argument("--n-clusters", type=int, default=CNT.CLUSTER_N_CLUSTERS)
+    parser.add_argument("--sweep", action="store_true", help="Also evaluate the k sweep for the elbow method.")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes of the k sweep.")
+    parser.add_argument("--output", default=None, help="CSV of incident_id and cluster written by assign.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging()
+    if args.command == "fit":
+        clusterer = IncidentClusterer()
+        data_df = read_incidents(args.source, clusterer.features)
+        labels = clusterer.fit(data_df, args.n_clusters, sweep=args.sweep, max_workers=args.workers)
+        if clusterer.sweep:
+            print(clusterer.sweep)
+        print(clusterer.summary(data_df, labels))
+        clusterer.save(args.model_dir)
+    else:
+        if not args.output:
+            raise SystemExit("assign needs --output.")
+        assign_file(IncidentClusterer.load(args.model_dir), args.source, args.output)
@@ -0,0 +1,63 @@
+import numpy as np
+import tensorflow as tf
+
+class LSTMRollout:
+    """
+    Autoregressive rollout engine for the time series LSTMs. Each step calls the model through a
+    compiled tf.function instead of `model.predict`, and the input windows are views into one
+    preallocated buffer, so nothing is re-allocated per step. Many scenarios (starting windows)
+    are rolled out together in one batched call per step.
+    """
+
+    def __init__(self, model, scaler, ts):
+        """
+        Initializes the engine.
+
+        Args:
+            model: A Keras model mapping a (batch, ts, 1) window to a (batch, 1) next value.
+            scaler: The fitted scaler used to inverse-transform the predictions.
+            ts: The window length the model was trained with.
+        """
+        self.model = model
+        self.scaler = scaler
+        self.ts = ts
+        self._step = tf.function(
+            lambda window: model(window, training=False),
+            input_signature=[tf.TensorSpec(shape=(None, ts, 1), dtype=tf.float32)],
+        )
+
+    def rollout_scaled(self, windows, future_steps):
+        """
+        Rolls out every window for `future_steps` steps in the model's scaled space.
+
+        Args:
+            windows: Array of shape (n_scenarios, ts) or (n_scenarios, ts, 1) of scaled values.
+            future_steps: Number of steps to predict.
+
+        Returns:
+            Array of shape (n_scenarios, future_steps) of scaled predictions.
+        """
+        windows = np.asarray(windows, dtype=np.float32).reshape(-1, self.ts)
+        n_scenarios = windows.shape[0]
+
+        # The window for step i is buffer[:, i:i + ts]; step i writes its prediction to buffer[:, ts + i]
+        buffer = np.empty((n_scenarios, self.ts + future_steps, 1), dtype=np.float32)
+        buffer[:, :self.ts, 0] = windows
+        for step in range(future_steps):
+            next_pred = self._step(buffer[:, step:step + self.ts])
+            buffer[:, self.ts + step, 0] = np.asarray(next_pred).reshape(n_scenarios)
+        return buffer[:, self.ts:, 0].copy()
+
+    def rollout(self, windows, future_steps):
+        """
+        Rolls out every window for `future_steps` steps and returns the predictions in original units.
+
+        Args:
+            windows: Array of shape (n_scenarios, ts) or (n_scenarios, ts, 1) of scaled values.
+            future_steps: Number of steps to predict.
+
+        Returns:
+            Array of shape (n_scenarios, future_steps).
+        """
+        scaled = self.rollout_scaled(windows, future_steps)
+        return self.scaler.inverse_transform(scaled.reshape(-1, 1)).reshape(scaled.shape)
@@ -0,0 +1,270 @@
+import os
+import sys
+import time
+import asyncio
+import logging
+import argparse
+from collections import deque
+import joblib
+import numpy as np
+from aiohttp import web
+from tensorflow.keras.models import load_model
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.instrumentation import get_logger, configure_logging, stage
+from scripts.forecast_engine import LSTMRollout
+
+LOGGER = get_logger("forecast_server")
+
+class ForecastMetrics:
+    """
+    Latency and throughput counters of one forecasting model.
+    """
+
+    def __init__(self, window=CNT.FORECAST_METRICS_WINDOW):
+        """
+        Initializes the counters.
+
+        Args:
+            window: Number of most recent request latencies kept for the percentiles.
+        """
+        self.started = time.time()
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)
+
+    def record_batch(self, batch_size, latencies):
+        """
+        Records a served batch and the end-to-end latency of each of its requests.
+        """
+        self.batches += 1
+        self.requests += batch_size
+        self.latencies.extend(latencies)
+
+    def summary(self):
+        """
+        Returns the metrics as a dictionary.
+        """
+        uptime = time.time() - self.started
+        latencies_ms = np.array(self.latencies) * 1000
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "errors": self.errors,
+            "avg_batch_size": self.requests / self.batches if self.batches else 0.0,
+            "throughput_rps": self.requests / uptime if uptime else 0.0,
+            "latency_ms_p50": float(np.percentile(latencies_ms, 50)) if len(latencies_ms) else None,
+            "latency_ms_p95": float(np.percentile(latencies_ms, 95)) if len(latencies_ms) else None,
+            "latency_ms_max": float(latencies_ms.max()) if len(latencies_ms) else None,
+        }
+
+class BatchingForecaster:
+    """
+    Serves one LSTM model. Concurrent requests are queued and coalesced into one batched rollout per
+    requested horizon, which runs in a worker thread so the event loop keeps accepting requests.
+    """
+
+    def __init__(self, name, engine, max_batch_size=CNT.FORECAST_MAX_BATCH_SIZE,
+                 max_wait_ms=CNT.FORECAST_MAX_WAIT_MS):
+        """
+        Initializes the forecaster.
+
+        Args:
+            name: Name of the interval served, e.g. "weekly".
+            engine: The LSTMRollout of the model.
+            max_batch_size: Maximum number of requests per batched rollout.
+            max_wait_ms: Time to wait for more requests once the first one of a batch arrived.
+        """
+        self.name = name
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.metrics = ForecastMetrics()
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        """
+        Starts the batching loop on the running event loop.
+        """
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Stops the batching loop.
+        """
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def forecast(self, window, horizon):
+        """
+        Queues a request and waits for its predictions.
+
+        Args:
+            window: Scaled input values of length ts.
+            horizon: Number of steps to predict.
+
+        Returns:
+            List of `horizon` predictions in original units.
+        """
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((window, horizon, time.perf_counter(), future))
+        return await future
+
+    def _rollout(self, windows, horizon):
+        with stage("forecast.rollout", LOGGER, logging.DEBUG, interval=self.name, batch_size=len(windows),
+                   horizon=horizon):
+            return self.engine.rollout(windows, horizon)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            # Each horizon runs its own rollout, shortest first, so short requests do not wait for
+            # the steps only the longer requests of the batch need
+            groups = {}
+            for request in batch:
+                groups.setdefault(request[1], []).append(request)
+            for horizon in sorted(groups):
+                await self._serve_group(groups[horizon], horizon)
+
+    async def _serve_group(self, group, horizon):
+        loop = asyncio.get_running_loop()
+        windows = np.stack([window for window, _, _, _ in group])
+        try:
+            predictions = await loop.run_in_executor(None, self._rollout, windows, horizon)
+        except Exception as e:
+            self.metrics.errors += len(group)
+            for _, _, _, future in group:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        done = time.perf_counter()
+        for row, (_, _, _, future) in zip(predictions, group):
+            if not future.done():
+                future.set_result(row[:horizon].tolist())
+        self.metrics.record_batch(len(group), [done - queued for _, _, queued, _ in group])
+
+def load_forecasters(model_dir=CNT.FORECAST_MODEL_DIR, intervals=CNT.FORECAST_INTERVALS):
+    """
+    Loads every configured interval's model and scaler once.
+
+    Args:
+        model_dir: Directory holding the lstm_model_<interval>.h5 and scaler_<interval>.pkl files.
+        intervals: Mapping of interval name to its window length and default horizon.
+
+    Returns:
+        Dictionary of interval name to BatchingForecaster.
+    """
+    forecasters = {}
+    for name, config in intervals.items():
+        model_path = os.path.join(model_dir, f"lstm_model_{name}.h5")
+        scaler_path = os.path.join(model_dir, f"scaler_{name}.pkl")
+        if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
+            LOGGER.warning(f"Skipping the {name} forecaster, model files not found in {model_dir}.")
+            continue
+        with stage("forecast.load_model", LOGGER, interval=name):
+            engine = LSTMRollout(load_model(model_path), joblib.load(scaler_path), config["ts"])
+        forecasters[name] = BatchingForecaster(name, engine)
+    return forecasters
+
+async def handle_forecast(request):
+    """
+    POST /forecast/{interval} with JSON {"window": [...], "horizon": n, "scaled": bool}.
+    The window defaults to zeros of the model's length; values are scaled with the model's scaler
+    unless "scaled" is true, and only the last ts values of a longer window are used.
+    """
+    name = request.match_info["interval"]
+    forecaster = request.app["forecasters"].get(name)
+    if forecaster is None:
+        raise web.HTTPNotFound(text=f"Unknown interval: {name}")
+    config = CNT.FORECAST_INTERVALS[name]
+    ts = config["ts"]
+
+    try:
+        body = await request.json() if request.can_read_body else {}
+        if not isinstance(body, dict):
+            raise TypeError("the body must be a JSON object")
+        window = np.asarray(body.get("window", np.zeros(ts)), dtype=np.float32).reshape(-1)
+    except (ValueError, TypeError) as e:
+        raise web.HTTPBadRequest(text=f"Invalid request: {e}")
+    horizon = body.get("horizon", config["horizon"])
+    if isinstance(horizon, bool) or not isinstance(horizon, int) or not 0 < horizon <= CNT.FORECAST_MAX_HORIZON:
+        raise web.HTTPBadRequest(text=f"horizon must be an integer between 1 and {CNT.FORECAST_MAX_HORIZON}")
+    if len(window) < ts:
+        raise web.HTTPBadRequest(text=f"window must hold at least {ts} values for the {name} model")
+    window = window[-ts:]
+    if not body.get("scaled", False):
+        window = forecaster.engine.scaler.transform(window.reshape(-1, 1)).reshape(-1).astype(np.float32)
+
+    predictions = await forecaster.forecast(window, horizon)
+    return web.json_response({"interval": name, "horizon": horizon, "predictions": predictions})
+
+async def handle_metrics(request):
+    """
+    GET /metrics: latency and throughput per model.
+    """
+    return web.json_response({name: forecaster.metrics.summary()
+                              for name, forecaster in request.app["forecasters"].items()})
+
+async def handle_health(request):
+    """
+    GET /health: the intervals being served.
+    """
+    return web.json_response({"status": "ok", "intervals": sorted(request.app["forecasters"])})
+
+def create_app(forecasters):
+    """
+    Builds the aiohttp application serving the given forecasters.
+    """
+    app = web.Application()
+    app["forecasters"] = forecasters
+
+    async def on_startup(app):
+        for forecaster in app["forecasters"].values():
+            forecaster.start()
+
+    async def on_cleanup(app):
+        for forecaster in app["forecasters"].values():
+            await forecaster.stop()
+
+    app.on_startup.append(on_startup)
+    app.on_cleanup.append(on_cleanup)
+    app.router.add_post("/forecast/{interval}", handle_forecast)
+    app.router.add_get("/metrics", handle_metrics)
+    app.router.add_get("/health", handle_health)
+    return app
+
+def parse_args():
+    """
+    Parses the command line arguments of the forecasting service.
+    """
+    parser = argparse.ArgumentParser(description="Serves the LSTM forecasters over HTTP/JSON.")
+    parser.add_argument("--host", default=CNT.FORECAST_SERVER_HOST)
+    parser.add_argument("--port", type=int, default=CNT.FORECAST_SERVER_PORT)
+    parser.add_argument("--model-dir", default=CNT.FORECAST_MODEL_DIR)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging()
+    web.run_app(create_app(load_forecasters(args.model_dir)), host=args.host, port=args.port)
@@ -0,0 +1,165 @@
+import os
+import re
+import sys
+import time
+import argparse
+import numpy as np
+import pandas as pd
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.freq_encoding import (
+    GUN_COLUMNS, ENCODED_COLUMNS, UNKNOWN_PATTERN, VALUE_DELIMITER, freq_targets, freq_columns)
+from helper.instrumentation import get_logger, configure_logging, log_stage
+
+LOGGER = get_logger("freq_encoder")
+
+# Spark regexes are ASCII-only by default, the same flag keeps the output identical to the Spark pipeline
+_FLAGS = re.ASCII
+
+FREQ_COLUMNS = freq_columns()
+_FREQ_INDEX = {name: i for i, name in enumerate(FREQ_COLUMNS)}
+_TARGETS = freq_targets()
+
+def clean_unknown_values(values):
+    """
+    Removes 'n::Unknown' and 'n:Unknown' entries of a delimited column while preserving the valid entries.
+
+    Args:
+        values: pandas Series of delimited strings.
+
+    Returns:
+        The cleaned Series.
+    """
+    values = values.str.replace(UNKNOWN_PATTERN, "", regex=True, flags=_FLAGS)
+    values = values.str.replace(r"\|\|+", "||", regex=True, flags=_FLAGS)
+    return values.str.replace(r"^\|\||\|\|$", "", regex=True, flags=_FLAGS).str.strip(" ")
+
+def _unknown_if_empty(values):
+    values = values.mask(values == "", "Unknown")
+    return values.mask(values == "Other", "Unknown")
+
+def normalize_gun_values(values):
+    """
+    Normalizes entries of a gun column, e.g. "0::9mm" to "mm" or "1::Other" to "unknown".
+    """
+    values = values.str.replace(r"(:|::)", "", regex=True, flags=_FLAGS)
+    values = values.str.replace(r"\d+", "", regex=True, flags=_FLAGS)
+    values = values.str.replace(r"[\[\]{}()]", "", regex=True, flags=_FLAGS)
+    values = values.str.replace(r"\s*[-_.]\s*", " ", regex=True, flags=_FLAGS)
+    values = _unknown_if_empty(values).str.strip(" ").str.lower()
+    return values.str.replace(r"\s+", "_", regex=True, flags=_FLAGS)
+
+def normalize_participant_values(values):
+    """
+    Normalizes entries of a participant column, e.g. "0::Adult 18+" to "adult_18plus".
+    """
+    values = values.str.replace(r"(:|::)", "", regex=True, flags=_FLAGS)
+    values = values.str.replace(r"\+", "plus", regex=True, flags=_FLAGS)
+    values = values.str.replace(r"^\d+", "", regex=True, flags=_FLAGS)
+    values = _unknown_if_empty(values).str.strip(" ").str.lower()
+    return values.str.replace(r"[\s-]+", "_", regex=True, flags=_FLAGS)
+
+def _value_matrix(source_col, values):
+    """
+    Builds the 0/1 matrix mapping each normalized value to the *_freq columns it is counted in.
+    """
+    matrix = np.zeros((len(values), len(FREQ_COLUMNS)), dtype=np.int32)
+    for i, value in enumerate(values):
+        for freq_col in _TARGETS[source_col].get(value, []):
+            matrix[i, _FREQ_INDEX[freq_col]] = 1
+    return matrix
+
+def encode_frequencies(data_df):
+    """
+    Computes the *_freq columns of the delimited gun and participant columns with vectorized string
+    operations. Every column is split and exploded once; the raw entries are factorized so that only the
+    few distinct entries are normalized, and the per-row counts are accumulated with bincounts.
+
+    Args:
+        data_df: DataFrame holding the raw gun_stolen, gun_type and participant_* columns.
+
+    Returns:
+        DataFrame with the *_freq columns in table order, on the index of `data_df`.
+    """
+    nrows = len(data_df)
+    counts = np.zeros((nrows, len(FREQ_COLUMNS)), dtype=np.int32)
+    for source_col in ENCODED_COLUMNS:
+        raw = pd.Series(data_df[source_col].to_numpy(dtype=object), index=np.arange(nrows))
+        entries = clean_unknown_values(raw.dropna().astype(str)).str.split(VALUE_DELIMITER, regex=True).explode()
+        codes, uniques = pd.factorize(entries)
+        if not len(uniques):
+            continue
+
+        normalize = normalize_gun_values if source_col in GUN_COLUMNS else normalize_participant_values
+        value_codes, values = pd.factorize(normalize(pd.Series(uniques, dtype=object)))
+        value_matrix = _value_matrix(source_col, list(values))
+
+        # Each frequency column is a weighted bincount of the entries' rows, memory stays O(entries)
+        rows = entries.index.to_numpy()
+        entry_values = value_codes[codes]
+        for j in np.flatnonzero(value_matrix.any(axis=0)):
+            weights = value_matrix[entry_values, j]
+            counts[:, j] += np.bincount(rows, weights=weights, minlength=nrows).astype(np.int32)
+
+    return pd.DataFrame(counts.astype(np.int16), columns=FREQ_COLUMNS, index=data_df.index)
+
+def iter_encoded_chunks(path, chunksize=CNT.FREQ_ENCODER_CHUNK_ROWS):
+    """
+    Reads the delimited columns of a raw GVA CSV in chunks and encodes each chunk, so memory stays bounded
+    by the chunk size.
+
+    Args:
+        path: Path of the raw GVA CSV.
+        chunksize: Number of rows per chunk.
+
+    Returns:
+        Generator of DataFrames with incident_id and the *_freq columns.
+    """
+    usecols = ["incident_id"] + ENCODED_COLUMNS
+    dtypes = {col: "object" for col in ENCODED_COLUMNS}
+    with pd.read_csv(path, usecols=usecols, dtype=dtypes, chunksize=chunksize) as reader:
+        for chunk_df in reader:
+            encoded_df = encode_frequencies(chunk_df)
+            encoded_df.insert(0, "incident_id", chunk_df["incident_id"])
+            yield encoded_df
+
+def encode_file(path, output_path, chunksize=CNT.FREQ_ENCODER_CHUNK_ROWS):
+    """
+    Encodes a raw GVA CSV chunk by chunk into a CSV of incident_id and the *_freq columns.
+
+    Args:
+        path: Path of the raw GVA CSV.
+        output_path: Path of the CSV to write.
+        chunksize: Number of rows per chunk.
+
+    Returns:
+        Dictionary with the number of rows and chunks and the elapsed time.
+    """
+    start = time.perf_counter()
+    report = {"path": path, "output": output_path, "nrows": 0, "nchunks": 0, "elapsed": 0.0}
+    for encoded_df in iter_encoded_chunks(path, chunksize):
+        encoded_df.to_csv(output_path, mode="a" if report["nchunks"] else "w", header=not report["nchunks"],
+                          index=False)
+        report["nrows"] += len(encoded_df)
+        report["nchunks"] += 1
+    report["elapsed"] = time.perf_counter() - start
+    log_stage({"stage": "freq_encoder.encode", "status": "ok", "elapsed_s": report["elapsed"], "path": path,
+               "nchunks": report["nchunks"], "nrows": report["nrows"]}, LOGGER)
+    return report
+
+def parse_args():
+    """
+    Parses the command line arguments of the frequency encoder.
+    """
+    parser = argparse.ArgumentParser(description="Encodes the delimited gun and participant columns into *_freq columns.")
+    parser.add_argument("--source", default=CNT.RAW_DATA_PATH, help="Raw GVA CSV.")
+    parser.add_argument("--output", required=True, help="CSV of incident_id and the *_freq columns to write.")
+    parser.add_argument("--chunksize", type=int, default=CNT.FREQ_ENCODER_CHUNK_ROWS)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging()
+    encode_file(args.source, args.output, args.chunksize)
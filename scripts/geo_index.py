@@ -0,0 +1,252 @@
+import os
+import sys
+import time
+import pickle
+import argparse
+import numpy as np
+import pandas as pd
+from scipy.spatial import cKDTree
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.instrumentation import get_logger, configure_logging, log_stage
+from scripts.incident_store import read_incidents
+
+LOGGER = get_logger("geo_index")
+
+EARTH_RADIUS_KM = 6371.0088
+
+# Columns kept per indexed incident, persisted as one .npy file each
+_ARRAYS = ["incident_id", "latitude", "longitude", "date", "n_killed", "n_injured"]
+
+def _to_unit_xyz(latitude, longitude):
+    """
+    Maps coordinates in degrees to points on the unit sphere, where euclidean (chord) distances are
+    monotonic in great-circle distances.
+    """
+    lat, lon = np.radians(latitude), np.radians(longitude)
+    return np.column_stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+def _chord(distance_km):
+    return 2 * np.sin(np.asarray(distance_km) / (2 * EARTH_RADIUS_KM))
+
+def _arc_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0, 1))
+
+class IncidentGeoIndex:
+    """
+    A spatial index over the incident coordinates. Incidents are stored in arrays sorted by latitude, so
+    bounding boxes are answered with a binary search, and a KD-tree over their unit-sphere positions
+    answers radius and k-nearest queries in great-circle kilometres. Incidents with the missing-coordinate
+    sentinel are left out. Hotspot aggregates of n_killed and n_injured per grid cell and time window are
+    precomputed, and everything is persisted to disk and memory-mapped back.
+    """
+
+    def __init__(self, arrays, tree=None, hotspots=None, cell_degrees=CNT.GEO_GRID_DEGREES,
+                 freq=CNT.GEO_HOTSPOT_FREQ):
+        """
+        Initializes the index from arrays already sorted by latitude; use `from_dataframe` to build one.
+
+        Args:
+            arrays: Dictionary of the _ARRAYS columns.
+            tree: Optional prebuilt cKDTree over the arrays' positions.
+            hotspots: Optional precomputed hotspot DataFrame.
+            cell_degrees: Size of the hotspot grid cells in degrees.
+            freq: pandas period frequency of the hotspot time windows, e.g. "M" or "Y".
+        """
+        self.arrays = arrays
+        self.tree = tree if tree is not None else cKDTree(_to_unit_xyz(arrays["latitude"], arrays["longitude"]))
+        self.cell_degrees = cell_degrees
+        self.freq = freq
+        self._hotspots = hotspots
+
+    @classmethod
+    def from_dataframe(cls, data_df, cell_degrees=CNT.GEO_GRID_DEGREES, freq=CNT.GEO_HOTSPOT_FREQ):
+        """
+        Builds the index from the cleaned data.
+
+        Args:
+            data_df: DataFrame holding incident_id, date, latitude, longitude, n_killed and n_injured.
+            cell_degrees: Size of the hotspot grid cells in degrees.
+            freq: pandas period frequency of the hotspot time windows.
+        """
+        start = time.perf_counter()
+        latitude = data_df["latitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+        longitude = data_df["longitude"].to_numpy(dtype=np.float64, na_value=np.nan)
+        valid = ((latitude != CNT.GEO_MISSING_COORDINATE) & (longitude != CNT.GEO_MISSING_COORDINATE)
+                 & (np.abs(latitude) <= 90) & (np.abs(longitude) <= 180))
+        order = np.flatnonzero(valid)[np.argsort(latitude[valid], kind="stable")]
+
+        arrays = {
+            "incident_id": data_df["incident_id"].to_numpy(dtype=np.int64)[order],
+            "latitude": latitude[order],
+            "longitude": longitude[order],
+            "date": pd.to_datetime(data_df["date"]).to_numpy(dtype="datetime64[D]")[order],
+            "n_killed": data_df["n_killed"].fillna(0).to_numpy(dtype=np.int32)[order],
+            "n_injured": data_df["n_injured"].fillna(0).to_numpy(dtype=np.int32)[order],
+        }
+        index = cls(arrays, cell_degrees=cell_degrees, freq=freq)
+        index.build_hotspots()
+        log_stage({"stage": "geo_index.build", "status": "ok", "elapsed_s": time.perf_counter() - start,
+                   "nrows": len(order), "without_coordinates": len(data_df) - len(order)}, LOGGER)
+        return index
+
+    def __len__(self):
+        return len(self.arrays["latitude"])
+
+    def incidents(self, positions, distances_km=None):
+        """
+        Returns the indexed incidents at the given positions as a DataFrame.
+        """
+        result_df = pd.DataFrame({name: values[positions] for name, values in self.arrays.items()})
+        if distances_km is not None:
+            result_df["distance_km"] = distances_km
+        return result_df
+
+    def radius(self, latitude, longitude, radius_km):
+        """
+        Finds the incidents within `radius_km` great-circle kilometres of a point.
+
+        Returns:
+            DataFrame of the incidents with their distance_km, nearest first.
+        """
+        center = _to_unit_xyz([latitude], [longitude])[0]
+        positions = np.asarray(self.tree.query_ball_point(center, _chord(radius_km)), dtype=np.int64)
+        distances = _arc_km(np.linalg.norm(self.tree.data[positions] - center, axis=1))
+        order = np.argsort(distances, kind="stable")
+        return self.incidents(positions[order], distances[order])
+
+    def count_within(self, latitudes, longitudes, radius_km):
+        """
+        Counts the incidents within `radius_km` of each of many points in one vectorized query.
+
+        Returns:
+            Array of counts, one per point.
+        """
+        centers = _to_unit_xyz(np.asarray(latitudes, dtype=np.float64), np.asarray(longitudes, dtype=np.float64))
+        return self.tree.query_ball_point(centers, _chord(radius_km), return_length=True)
+
+    def nearest(self, latitude, longitude, k=10):
+        """
+        Finds the k incidents nearest to a point.
+
+        Returns:
+            DataFrame of the incidents with their distance_km, nearest first.
+        """
+        k = min(k, len(self))
+        chords, positions = self.tree.query(_to_unit_xyz([latitude], [longitude])[0], k=k)
+        return self.incidents(np.atleast_1d(positions), _arc_km(np.atleast_1d(chords)))
+
+    def bbox(self, min_latitude, min_longitude, max_latitude, max_longitude):
+        """
+        Finds the incidents inside a latitude/longitude bounding box. The latitude range is a binary
+        search on the sorted latitudes, only that slice is filtered on longitude.
+
+        Returns:
+            DataFrame of the incidents.
+        """
+        latitude = self.arrays["latitude"]
+        start = np.searchsorted(latitude, min_latitude, side="left")
+        stop = np.searchsorted(latitude, max_latitude, side="right")
+        longitude = self.arrays["longitude"][start:stop]
+        positions = start + np.flatnonzero((longitude >= min_longitude) & (longitude <= max_longitude))
+        return self.incidents(positions)
+
+    def build_hotspots(self):
+        """
+        Aggregates the incidents per grid cell and time window: number of incidents and sums of n_killed
+        and n_injured. Cells are identified by the latitude/longitude of their south-west corner.
+
+        Returns:
+            DataFrame with period, cell_latitude, cell_longitude, n_incidents, n_killed and n_injured.
+        """
+        cell_df = pd.DataFrame({
+            "period": pd.PeriodIndex(self.arrays["date"], freq=self.freq).astype(str),
+            "cell_latitude": np.floor(self.arrays["latitude"] / self.cell_degrees) * self.cell_degrees,
+            "cell_longitude": np.floor(self.arrays["longitude"] / self.cell_degrees) * self.cell_degrees,
+            "n_killed": self.arrays["n_killed"],
+            "n_injured": self.arrays["n_injured"],
+        })
+        self._hotspots = cell_df.groupby(["period", "cell_latitude", "cell_longitude"], sort=True).agg(
+            n_incidents=("n_killed", "size"), n_killed=("n_killed", "sum"), n_injured=("n_injured", "sum")
+        ).reset_index()
+        return self._hotspots
+
+    def hotspots_frame(self):
+        """
+        Returns the per-window hotspot aggregates, computing them if needed.
+        """
+        return self._hotspots if self._hotspots is not None else self.build_hotspots()
+
+    def hotspots(self, start=None, end=None, by="n_killed", top=None):
+        """
+        Returns the precomputed grid aggregates summed over the time windows between `start` and `end`.
+
+        Args:
+            start: Optional first period, e.g. "2016-01" for monthly windows.
+            end: Optional last period, inclusive.
+            by: Column the cells are ranked by: n_killed, n_injured or n_incidents.
+            top: Optional number of cells to return.
+
+        Returns:
+            DataFrame with cell_latitude, cell_longitude, n_incidents, n_killed and n_injured.
+        """
+        hotspot_df = self.hotspots_frame()
+        if start is not None:
+            hotspot_df = hotspot_df[hotspot_df["period"] >= str(start)]
+        if end is not None:
+            hotspot_df = hotspot_df[hotspot_df["period"] <= str(end)]
+        cells_df = hotspot_df.groupby(["cell_latitude", "cell_longitude"], sort=False)[
+            ["n_incidents", "n_killed", "n_injured"]].sum().reset_index()
+        cells_df = cells_df.sort_values(by, ascending=False, kind="stable", ignore_index=True)
+        return cells_df.head(top) if top else cells_df
+
+    def save(self, index_dir=CNT.GEO_INDEX_DIR):
+        """
+        Persists the arrays as .npy files, the KD-tree and the hotspot aggregates.
+        """
+        os.makedirs(index_dir, exist_ok=True)
+        for name, values in self.arrays.items():
+            np.save(os.path.join(index_dir, f"{name}.npy"), values)
+        with open(os.path.join(index_dir, "tree.pkl"), "wb") as f:
+            pickle.dump({"tree": self.tree, "cell_degrees": self.cell_degrees, "freq": self.freq}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+        self.hotspots_frame().to_parquet(os.path.join(index_dir, "hotspots.parquet"), index=False)
+        LOGGER.info(f"Saved the geo index of {len(self)} incidents to {index_dir}.")
+
+    @classmethod
+    def load(cls, index_dir=CNT.GEO_INDEX_DIR):
+        """
+        Loads an index persisted with `save`, memory-mapping its arrays.
+        """
+        arrays = {name: np.load(os.path.join(index_dir, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        with open(os.path.join(index_dir, "tree.pkl"), "rb") as f:
+            state = pickle.load(f)
+        hotspots = pd.read_parquet(os.path.join(index_dir, "hotspots.parquet"))
+        return cls(arrays, state["tree"], hotspots, state["cell_degrees"], state["freq"])
+
+def parse_args():
+    """
+    Parses the command line arguments of the geo index.
+    """
+    parser = argparse.ArgumentParser(description="Builds the incident geo index or queries its hotspots.")
+    parser.add_argument("command", choices=["build", "hotspots"])
+    parser.add_argument("--source", default=CNT.CLEANED_DATA_PATH, help="Cleaned data CSV or incident store.")
+    parser.add_argument("--index-dir", default=CNT.GEO_INDEX_DIR)
+    parser.add_argument("--cell-degrees", type=float, default=CNT.GEO_GRID_DEGREES)
+    parser.add_argument("--freq", default=CNT.GEO_HOTSPOT_FREQ, help="Hotspot time window, e.g. M or Y.")
+    parser.add_argument("--start", default=None)
+    parser.add_argument("--end", default=None)
+    parser.add_argument("--by", choices=["n_killed", "n_injured", "n_incidents"], default="n_killed")
+    parser.add_argument("--top", type=int, default=20)
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging()
+    if args.command == "build":
+        data_df = read_incidents(args.source, _ARRAYS)
+        IncidentGeoIndex.from_dataframe(data_df, args.cell_degrees, args.freq).save(args.index_dir)
+    else:
+        print(IncidentGeoIndex.load(args.index_dir).hotspots(args.start, args.end, args.by, args.top))
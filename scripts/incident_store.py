@@ -0,0 +1,284 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+from pyarrow import fs
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.schema import parse_table_schema
+from helper.instrumentation import get_logger, configure_logging, log_stage
+from scripts.typed_reader import DTYPES, CoercionReport, read_typed_csv, iter_typed_csv
+from scripts.parquet_stage import arrow_schema, to_arrow
+
+_PANDAS_TYPES = {
+    pa.int8(): pd.Int8Dtype(),
+    pa.int16(): pd.Int16Dtype(),
+    pa.int32(): pd.Int32Dtype(),
+}
+
+LOGGER = get_logger("incident_store")
+
+STORE_COLUMNS = [name for name, _ in parse_table_schema()]
+STORE_SCHEMA = arrow_schema()
+PARTITION_SCHEMA = pa.schema([STORE_SCHEMA.field(name) for name in CNT.INCIDENT_STORE_PARTITIONS])
+
+MANIFEST_FILE = "_store.json"
+
+def _restore_dtypes(data_df):
+    """
+    Converts the text and date columns of a DataFrame read from the store back to the typed reader's dtypes.
+    """
+    for col in data_df.columns:
+        if DTYPES.get(col) in ("category", "object"):
+            data_df[col] = data_df[col].astype(DTYPES[col])
+        elif col not in DTYPES:
+            data_df[col] = data_df[col].astype("datetime64[ns]")
+    return data_df
+
+def _to_typed_pandas(table):
+    """
+    Converts a table read from the store to a DataFrame with the typed reader's dtypes.
+    """
+    return _restore_dtypes(table.to_pandas(types_mapper=_PANDAS_TYPES.get, date_as_object=False))
+
+def _source_fingerprint(csv_path):
+    stat = os.stat(csv_path)
+    return {"source": os.path.abspath(csv_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def build_store(csv_path=CNT.CLEANED_DATA_PATH, store_dir=CNT.INCIDENT_STORE_DIR,
+                chunksize=CNT.INCIDENT_STORE_CHUNK_ROWS, force=False):
+    """
+    Converts the cleaned CSV once into uncompressed Arrow IPC files partitioned by year and state
+    (year=2017/state=Ohio/part-0.arrow). The CSV is parsed chunk by chunk with the typed reader, and the
+    conversion is skipped if the store is already current for the source file.
+
+    Args:
+        csv_path: Path of the cleaned data CSV.
+        store_dir: Directory of the store.
+        chunksize: Number of rows parsed per chunk.
+        force: Re-create the store even if it is current.
+
+    Returns:
+        Dictionary with the number of rows, the coercion summary and the elapsed time.
+    """
+    manifest = read_manifest(store_dir)
+    if not force and manifest is not None and manifest["fingerprint"] == _source_fingerprint(csv_path):
+        LOGGER.info(f"Incident store {store_dir} is current, skipping the conversion.")
+        return {"store": store_dir, "nrows": manifest["nrows"], "skipped": True, "elapsed": 0.0}
+
+    if os.path.isdir(store_dir) and os.listdir(store_dir):
+        if manifest is None:
+            raise ValueError(f"{store_dir} is not empty and not an incident store, refusing to overwrite it.")
+        shutil.rmtree(store_dir)
+
+    start = time.perf_counter()
+    report = CoercionReport()
+
+    def batches():
+        for chunk_df in iter_typed_csv(csv_path, chunksize, report):
+            yield from to_arrow(chunk_df, STORE_SCHEMA).to_batches()
+
+    ds.write_dataset(batches(), store_dir, schema=STORE_SCHEMA, format="ipc",
+                     partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"),
+                     basename_template="part-{i}.arrow", existing_data_behavior="overwrite_or_ignore")
+
+    manifest = {"fingerprint": _source_fingerprint(csv_path), "nrows": report.rows_read,
+                "partitions": CNT.INCIDENT_STORE_PARTITIONS}
+    with open(os.path.join(store_dir, MANIFEST_FILE), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+    elapsed = time.perf_counter() - start
+    log_stage({"stage": "incident_store.build", "status": "ok", "elapsed_s": elapsed, "path": csv_path,
+               "nrows": report.rows_read, "rows_coerced": report.rows_coerced}, LOGGER)
+    if report.rows_coerced:
+        LOGGER.warning(f"Built {store_dir} with coerced values: {report}")
+    return {"store": store_dir, "nrows": report.rows_read, "skipped": False,
+            "coercion": report.summary(), "elapsed": elapsed}
+
+def read_manifest(store_dir):
+    """
+    Reads the manifest written by `build_store`, or returns None if `store_dir` is not a store.
+    """
+    manifest_path = os.path.join(store_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+def is_store(path):
+    """
+    Checks whether `path` is an incident store directory.
+    """
+    return os.path.isdir(path) and read_manifest(path) is not None
+
+def is_store_current(store_dir):
+    """
+    Checks whether the store was built from the current version of its source CSV. A store whose source
+    no longer exists is considered current, since it cannot be rebuilt.
+    """
+    source = read_manifest(store_dir)["fingerprint"]
+    return not os.path.exists(source["source"]) or source == _source_fingerprint(source["source"])
+
+class IncidentStore:
+    """
+    Read access to an incident store. Files are memory-mapped, so opening the store only reads file
+    footers, and a projected read of whole partitions returns Arrow columns backed by the mapped pages
+    without parsing or copying. Predicates on year and state skip the other partitions' files entirely.
+    """
+
+    def __init__(self, store_dir=CNT.INCIDENT_STORE_DIR):
+        """
+        Opens the store.
+
+        Args:
+            store_dir: Directory of a store built with `build_store`.
+        """
+        if not is_store(store_dir):
+            raise FileNotFoundError(f"No incident store at {store_dir}, build it with `python scripts/incident_store.py`.")
+        if not is_store_current(store_dir):
+            LOGGER.warning(f"Incident store {store_dir} is older than its source, rebuild it with "
+                           "`python scripts/incident_store.py`.")
+        self.store_dir = store_dir
+        self.dataset = ds.dataset(store_dir, format="ipc", filesystem=fs.LocalFileSystem(use_mmap=True),
+                                  partitioning=ds.partitioning(PARTITION_SCHEMA, flavor="hive"))
+
+    @property
+    def columns(self):
+        """
+        The column names, in table order.
+        """
+        return list(STORE_COLUMNS)
+
+    @staticmethod
+    def _filter(start=None, end=None, states=None, years=None):
+        """
+        Builds the dataset filter; date bounds also bound the year partitions so that they are pruned.
+        """
+        conditions = []
+        if start is not None:
+            start = pd.Timestamp(start)
+            conditions += [ds.field("year") >= start.year, ds.field("date") >= pa.scalar(start.date(), pa.date32())]
+        if end is not None:
+            end = pd.Timestamp(end)
+            conditions += [ds.field("year") <= end.year, ds.field("date") <= pa.scalar(end.date(), pa.date32())]
+        if states is not None:
+            conditions.append(ds.field("state").isin([states] if isinstance(states, str) else list(states)))
+        if years is not None:
+            conditions.append(ds.field("year").isin([years] if isinstance(years, int) else list(years)))
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+        return expression
+
+    def table(self, columns=None, start=None, end=None, states=None, years=None):
+        """
+        Reads the selected columns of the incidents matching the predicates.
+
+        Args:
+            columns: Optional list of columns, all columns by default.
+            start: Optional first date (inclusive).
+            end: Optional last date (inclusive).
+            states: Optional state name or list of state names.
+            years: Optional year or list of years.
+
+        Returns:
+            A pyarrow Table with the columns in table order.
+        """
+        columns = [col for col in STORE_COLUMNS if col in columns] if columns else self.columns
+        return self.dataset.to_table(columns=columns, filter=self._filter(start, end, states, years))
+
+    def view(self, columns=None, start=None, end=None, states=None, years=None):
+        """
+        Returns the matching incidents as a DataFrame of pyarrow-backed columns, which wraps the mapped
+        Arrow buffers instead of converting them. Arguments are as for `table`.
+        """
+        return self.table(columns, start, end, states, years).to_pandas(types_mapper=pd.ArrowDtype)
+
+    def to_pandas(self, columns=None, start=None, end=None, states=None, years=None):
+        """
+        Returns the matching incidents as a DataFrame with the compact dtypes of the typed CSV reader
+        (nullable integers, float32, categoricals and datetime64 dates), as `SnowFlakeSink.get_data` and
+        the plots expect. Arguments are as for `table`.
+        """
+        return _to_typed_pandas(self.table(columns, start, end, states, years))
+
+    def iter_batches(self, columns=None, batch_rows=CNT.INCIDENT_STORE_CHUNK_ROWS, start=None, end=None,
+                     states=None, years=None):
+        """
+        Yields the matching incidents in DataFrames of `batch_rows` rows (the last one may be shorter), with
+        the dtypes of `to_pandas`. The scan yields one small batch per partition file, so batches are combined
+        up to `batch_rows` before they are converted.
+        """
+        columns = [col for col in STORE_COLUMNS if col in columns] if columns else self.columns
+        scanner = self.dataset.scanner(columns=columns, filter=self._filter(start, end, states, years),
+                                       batch_size=batch_rows)
+        pending = []
+        npending = 0
+        for batch in scanner.to_batches():
+            pending.append(batch)
+            npending += batch.num_rows
+            if npending < batch_rows:
+                continue
+            table = pa.Table.from_batches(pending, schema=scanner.projected_schema)
+            nfull = npending - npending % batch_rows
+            for offset in range(0, nfull, batch_rows):
+                yield _to_typed_pandas(table.slice(offset, batch_rows))
+            pending = table.slice(nfull).to_batches()
+            npending -= nfull
+        if npending:
+            yield _to_typed_pandas(pa.Table.from_batches(pending, schema=scanner.projected_schema))
+
+    def count(self, start=None, end=None, states=None, years=None):
+        """
+        Counts the incidents matching the predicates.
+        """
+        return self.dataset.count_rows(filter=self._filter(start, end, states, years))
+
+def read_incidents(source, columns=None):
+    """
+    Reads the given columns of the cleaned data from an incident store directory or a CSV.
+
+    Args:
+        source: An incident store directory or a cleaned data CSV.
+        columns: Optional list of columns.
+
+    Returns:
+        A DataFrame with the typed reader's dtypes.
+    """
+    if is_store(source):
+        return IncidentStore(source).to_pandas(columns)
+    return read_typed_csv(source, columns=columns)
+
+def iter_incidents(source, columns=None, batch_rows=CNT.INCIDENT_STORE_CHUNK_ROWS):
+    """
+    Reads the given columns of the cleaned data from an incident store directory or a CSV in batches.
+
+    Returns:
+        Generator of DataFrames of at most `batch_rows` rows.
+    """
+    if is_store(source):
+        yield from IncidentStore(source).iter_batches(columns, batch_rows)
+        return
+    yield from iter_typed_csv(source, batch_rows, columns=columns)
+
+def parse_args():
+    """
+    Parses the command line arguments of the incident store builder.
+    """
+    parser = argparse.ArgumentParser(description="Builds the memory-mapped incident store from the cleaned CSV.")
+    parser.add_argument("--source", default=CNT.CLEANED_DATA_PATH, help="Cleaned data CSV.")
+    parser.add_argument("--store-dir", default=CNT.INCIDENT_STORE_DIR)
+    parser.add_argument("--chunksize", type=int, default=CNT.INCIDENT_STORE_CHUNK_ROWS)
+    parser.add_argument("--force", action="store_true", help="Rebuild even if the store is current.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging()
+    build_store(args.source, args.store_dir, args.chunksize, args.force)
@@ -0,0 +1,167 @@
+import os
+import sys
+import duckdb
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.instrumentation import get_logger, stage
+from scripts.snowflake_sink import SnowflakeConnector, statement_type
+
+LOGGER = get_logger("local_warehouse")
+
+# DuckDB spelling of the Snowflake types used in SF_TABLE_SCHEMA
+DUCKDB_TYPES = {
+    "STRING": "VARCHAR",
+}
+
+class DuckDBConnector(SnowflakeConnector):
+    """
+    An embedded stand-in for SnowflakeConnector backed by a local DuckDB file. It exposes the same
+    methods, so SnowFlakeSink and the query layer run unchanged without a Snowflake account, e.g. to
+    benchmark load throughput on a laptop or in an air-gapped CI job.
+    """
+
+    def __init__(self, database_path=CNT.LOCAL_WAREHOUSE_PATH, pooled=False):
+        """
+        Initializes the DuckDBConnector instance. Sets the connection and cursor to None.
+
+        :param database_path: Path of the DuckDB database file, or ":memory:".
+        :param pooled: Accepted for compatibility with SnowflakeConnector, DuckDB sessions are not pooled.
+        """
+        super().__init__(pooled=False)
+        self.database_path = database_path
+
+    def connect(self):
+        """
+        Opens the local DuckDB database, creating the file if needed.
+        """
+        try:
+            LOGGER.info(f"Opening local warehouse at {self.database_path}...")
+            with stage("warehouse.connect", LOGGER, backend="duckdb", path=self.database_path):
+                if self.database_path != ":memory:":
+                    os.makedirs(os.path.dirname(os.path.abspath(self.database_path)), exist_ok=True)
+                self.connection = duckdb.connect(self.database_path)
+                self.cursor = self.connection.cursor()
+        except Exception as e:
+            LOGGER.error(f"Error opening the local warehouse: {e}")
+            raise
+
+    def fetch_arrow(self, query, params=None):
+        """
+        Executes the provided SQL query and fetches the result as a pyarrow Table.
+
+        :param query: The SQL query to be executed.
+        :param params: Optional query parameters.
+        :return: The result as a pyarrow Table.
+        """
+        if not self.cursor:
+            raise Exception("Not connected to the local warehouse.")
+        try:
+            LOGGER.debug(f"Executing query: {query}")
+            with stage("warehouse.fetch_arrow", LOGGER, statement=statement_type(query)) as record:
+                result = self.cursor.execute(query, params).fetch_arrow_table()
+                record["nrows"] = result.num_rows
+            return result
+        except Exception as e:
+            LOGGER.error(f"Error executing query: {e}")
+            raise
+
+    def write_dataframe(self, data_df, table):
+        """
+        Bulk-inserts a DataFrame into an existing table, matching columns by name.
+
+        :param data_df: DataFrame whose columns match the table columns.
+        :param table: Name of the target table.
+        :return: Tuple (success, nchunks, nrows).
+        """
+        self.cursor.register("incoming_df", data_df)
+        try:
+            self.cursor.execute(f"INSERT INTO {table.upper()} BY NAME SELECT * FROM incoming_df")
+        finally:
+            self.cursor.unregister("incoming_df")
+        return True, 1, len(data_df)
+
+    def copy_parquet(self, parquet_dir, table):
+        """
+        Inserts the Parquet files of `parquet_dir` into the table with DuckDB's Parquet reader.
+
+        :param parquet_dir: Directory holding the Parquet files.
+        :param table: Name of the target table.
+        :return: Tuple (success, nfiles, nrows).
+        """
+        pattern = os.path.join(os.path.abspath(parquet_dir), "*.parquet").replace("\\", "/")
+        nfiles = self.execute_query(f"SELECT COUNT(*) FROM glob('{pattern}')")[0][0]
+        LOGGER.info(f"Copying {nfiles} Parquet files into {table}...")
+        result = self.execute_query(f"INSERT INTO {table.upper()} BY NAME SELECT * FROM read_parquet('{pattern}')")
+        return True, nfiles, result[0][0]
+
+    def merge_rows(self, merge_query):
+        """
+        Executes a MERGE statement. DuckDB only reports the total number of affected rows, so the
+        statement returns the action applied to each row and the inserted and updated rows are counted.
+
+        :param merge_query: The MERGE statement.
+        :return: Tuple (rows_inserted, rows_updated).
+        """
+        actions = [row[0] for row in self.execute_query(f"{merge_query} RETURNING merge_action")]
+        return actions.count("INSERT"), actions.count("UPDATE")
+
+    def table_version(self, table):
+        """
+        Returns a value that changes whenever the table is modified. DuckDB keeps no modification
+        timestamp, so the version is derived from the contents: the row count and the XOR of the row
+        hashes, which changes on any insert, delete or update, including those from other processes.
+
+        :param table: Name of the table.
+        :return: The version as a string, "missing" if the table does not exist.
+        """
+        exists = self.execute_query(
+            f"SELECT COUNT(*) FROM information_schema.tables WHERE upper(table_name) = '{table.upper()}'")[0][0]
+        if not exists:
+            return "missing"
+        nrows, digest = self.execute_query(f"SELECT COUNT(*), bit_xor(hash(t)) FROM {table.upper()} t")[0]
+        return f"{nrows}:{digest}"
+
+    def setup_env(self, dw_name, db_name, schema_name):
+        """
+        Creates the schema if it does not exist. Warehouses have no local equivalent and the database
+        is the DuckDB file itself, so both names are ignored.
+
+        :param dw_name: Name of the data warehouse (ignored).
+        :param db_name: Name of the database (ignored).
+        :param schema_name: Name of the schema to be created.
+        """
+        LOGGER.info(f"Setting up local environment: Schema '{schema_name}'")
+        self.execute_query(f"CREATE SCHEMA IF NOT EXISTS {schema_name}")
+        LOGGER.info(f"Environment setup complete: Schema: {schema_name}")
+
+    def create_table(self, dw_name, db_name, schema_name, table_name, table_schema, replace=True):
+        """
+        Creates a table in the specified schema, translating the Snowflake column types.
+
+        :param dw_name: Name of the data warehouse (ignored).
+        :param db_name: Name of the database (ignored).
+        :param schema_name: Name of the schema to be used.
+        :param table_name: Name of the table to be created.
+        :param table_schema: The Snowflake schema of the table to be created.
+        :param replace: Whether an existing table is replaced.
+        """
+        for sf_type, duckdb_type in DUCKDB_TYPES.items():
+            table_schema = table_schema.replace(f" {sf_type}", f" {duckdb_type}")
+        super().create_table(dw_name, db_name, schema_name, table_name, table_schema, replace=replace)
+
+    def use_env(self, dw_name, db_name, schema_name):
+        """
+        Switches to the specified schema; the warehouse and database names are ignored.
+
+        :param dw_name: Name of the data warehouse (ignored).
+        :param db_name: Name of the database (ignored).
+        :param schema_name: Name of the schema to switch to.
+        """
+        if self.env == (dw_name, db_name, schema_name):
+            return
+        self.execute_query(f"CREATE SCHEMA IF NOT EXISTS {schema_name}")
+        self.execute_query(f"SET schema = '{schema_name}'")
+        self.env = (dw_name, db_name, schema_name)
+        LOGGER.info(f"Switched to local schema '{schema_name}'.")
@@ -0,0 +1,152 @@
+import os
+import sys
+import json
+import glob
+import time
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.schema import parse_table_schema
+from helper.instrumentation import get_logger
+from scripts.typed_reader import DTYPES, CoercionReport, iter_typed_csv
+
+LOGGER = get_logger("parquet_stage")
+
+# Arrow type of each compact pandas dtype of the typed reader; categoricals are stored as plain strings
+# since every file must share one schema. Date columns are stored as date32.
+ARROW_TYPES = {
+    "Int8": pa.int8(),
+    "Int16": pa.int16(),
+    "Int32": pa.int32(),
+    "float32": pa.float32(),
+    "category": pa.string(),
+    "object": pa.string(),
+}
+
+MANIFEST_FILE = "_manifest.json"
+
+def arrow_schema(table_schema=CNT.SF_TABLE_SCHEMA):
+    """
+    Builds the Arrow schema of the table columns, using the typed reader's compact dtypes.
+
+    Args:
+        table_schema: The Snowflake table schema string.
+
+    Returns:
+        A pyarrow.Schema with one field per table column.
+    """
+    return pa.schema([(name, pa.date32() if name not in DTYPES else ARROW_TYPES[DTYPES[name]])
+                      for name, _ in parse_table_schema(table_schema)])
+
+def to_arrow(data_df, schema):
+    """
+    Converts a chunk of the typed reader into an Arrow table with the given schema.
+    """
+    for col in data_df.columns[data_df.dtypes == "category"]:
+        data_df[col] = data_df[col].astype(object)
+    return pa.Table.from_pandas(data_df[schema.names], schema=schema, preserve_index=False)
+
+def _source_fingerprint(csv_path):
+    """
+    Identifies a version of the source CSV by its size and modification time.
+    """
+    stat = os.stat(csv_path)
+    return {"source": os.path.abspath(csv_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+def read_manifest(parquet_dir):
+    """
+    Reads the manifest written by `csv_to_parquet`.
+
+    Args:
+        parquet_dir: Directory holding the staged Parquet files.
+
+    Returns:
+        The manifest dictionary, or None if the directory has not been staged yet.
+    """
+    manifest_path = os.path.join(parquet_dir, MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as manifest_file:
+        return json.load(manifest_file)
+
+def is_stage_current(csv_path, parquet_dir):
+    """
+    Checks whether the Parquet files in `parquet_dir` were produced from the current version of `csv_path`.
+    """
+    manifest = read_manifest(parquet_dir)
+    return manifest is not None and manifest["fingerprint"] == _source_fingerprint(csv_path)
+
+def csv_to_parquet(csv_path=CNT.CLEANED_DATA_PATH, parquet_dir=CNT.PARQUET_STAGE_DIR,
+                   rows_per_file=CNT.PARQUET_ROWS_PER_FILE, compression=CNT.PARQUET_COMPRESSION, force=False):
+    """
+    Converts the cleaned CSV once into typed, compressed Parquet files following SF_TABLE_SCHEMA.
+    The CSV is parsed chunk by chunk with the typed reader, so the staged files hold the same values and
+    dtypes as `get_data` (values that do not parse become nulls and are counted), and the conversion is
+    skipped if the staged files are already current for the source file.
+
+    Args:
+        csv_path: Path of the cleaned data CSV.
+        parquet_dir: Output directory for the Parquet files.
+        rows_per_file: Maximum number of rows per Parquet file.
+        compression: Parquet compression codec.
+        force: Re-create the files even if they are current.
+
+    Returns:
+        List of the Parquet file paths.
+    """
+    if not force and is_stage_current(csv_path, parquet_dir):
+        LOGGER.info(f"Parquet stage at {parquet_dir} is up to date with {csv_path}.")
+        return list_parquet_files(parquet_dir)
+
+    LOGGER.info(f"Converting {csv_path} to Parquet files in {parquet_dir}...")
+    start = time.perf_counter()
+    os.makedirs(parquet_dir, exist_ok=True)
+    for stale_file in list_parquet_files(parquet_dir):
+        os.remove(stale_file)
+
+    schema = arrow_schema()
+    report = CoercionReport()
+    paths = []
+    nrows = 0
+    for chunk_df in iter_typed_csv(csv_path, rows_per_file, report=report):
+        path = os.path.join(parquet_dir, f"part-{len(paths):05d}.parquet")
+        pq.write_table(to_arrow(chunk_df, schema), path, compression=compression)
+        paths.append(path)
+        nrows += len(chunk_df)
+
+    manifest = {"fingerprint": _source_fingerprint(csv_path), "nrows": nrows,
+                "files": [os.path.basename(path) for path in paths], "compression": compression,
+                "coercion": report.summary()}
+    with open(os.path.join(parquet_dir, MANIFEST_FILE), "w") as manifest_file:
+        json.dump(manifest, manifest_file, indent=2)
+
+    if report.rows_coerced:
+        LOGGER.warning(f"Staged {csv_path} with coerced values: {report}")
+    LOGGER.info(f"Wrote {nrows} rows to {len(paths)} Parquet files in {time.perf_counter() - start:.2f}s.")
+    return paths
+
+def list_parquet_files(parquet_dir=CNT.PARQUET_STAGE_DIR):
+    """
+    Lists the staged Parquet files in `parquet_dir`.
+    """
+    return sorted(glob.glob(os.path.join(parquet_dir, "*.parquet")))
+
+def load_parquet_stage(parquet_dir=CNT.PARQUET_STAGE_DIR, columns=None, filters=None):
+    """
+    Reads the staged Parquet files as the local analytical cache of the cleaned data.
+
+    Args:
+        parquet_dir: Directory holding the staged Parquet files.
+        columns: Optional list of columns to read.
+        filters: Optional pyarrow filters, e.g. [("year", "=", 2017)].
+
+    Returns:
+        A pandas DataFrame.
+    """
+    return pq.read_table(parquet_dir, columns=columns, filters=filters).to_pandas()
+
+if __name__ == "__main__":
+    csv_to_parquet(force="--force" in sys.argv[1:])
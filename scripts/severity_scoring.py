@@ -0,0 +1,370 @@
+import os
+import sys
+import json
+import time
+import argparse
+import joblib
+import numpy as np
+import pandas as pd
+import pyarrow.dataset as ds
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.schema import parse_table_schema
+from helper.instrumentation import get_logger, configure_logging, log_stage
+from scripts.incident_store import is_store, iter_incidents
+
+LOGGER = get_logger("severity_scoring")
+
+# Columns left out of the features of both tasks, as in the classification notebook
+_DROPPED_COLUMNS = ["n_killed", "incident_id", "date", "address", "congressional_district",
+                    "incident_characteristics", "latitude", "longitude", "notes", "city_or_county",
+                    "participant_status_injured_freq", "participant_status_killed_freq",
+                    "participant_status_arrested_freq", "participant_status_unharmed_freq",
+                    "participant_type_subject_suspect_freq", "participant_type_victim_freq"]
+
+TASKS = {
+    # Whether anyone was killed in the incident
+    "is_killed": {"dropped": _DROPPED_COLUMNS, "classes": [0, 1]},
+    # Low (0), moderate (1) or high (2) severity, from the score n_killed * 2.01 + n_injured
+    "severity": {"dropped": _DROPPED_COLUMNS + ["n_injured"], "classes": [0, 1, 2]},
+}
+
+# Text columns that are label-indexed into numeric features
+INDEXED_COLUMNS = ["state"]
+
+def make_labels(task, data_df):
+    """
+    Computes the target labels of a task from the casualty counts.
+
+    Args:
+        task: "is_killed" or "severity".
+        data_df: DataFrame holding n_killed and n_injured.
+
+    Returns:
+        Array of int labels.
+    """
+    n_killed = data_df["n_killed"].fillna(0).to_numpy(dtype=np.float64)
+    if task == "is_killed":
+        return (n_killed > 0).astype(np.int64)
+    severity_score = n_killed * 2.01 + data_df["n_injured"].fillna(0).to_numpy(dtype=np.float64)
+    return np.select([severity_score <= 0, severity_score <= 2], [0, 1], default=2)
+
+class LabelIndex:
+    """
+    Maps the values of a text column to numeric indices like Spark's StringIndexer: the most frequent
+    value gets index 0, ties are broken alphabetically. Values not seen during fitting, and missing
+    values, map to the extra index len(labels).
+    """
+
+    def __init__(self, labels=None):
+        """
+        Initializes the index.
+
+        Args:
+            labels: Optional list of fitted labels, most frequent first.
+        """
+        self.labels = list(labels or [])
+        self.lookup = {label: i for i, label in enumerate(self.labels)}
+
+    def fit(self, values):
+        """
+        Fits the labels on a Series of values.
+        """
+        counts = values.dropna().astype(str).value_counts()
+        self.labels = sorted(counts.index, key=lambda label: (-counts[label], label))
+        self.lookup = {label: i for i, label in enumerate(self.labels)}
+        return self
+
+    def transform(self, values):
+        """
+        Maps a Series of values to a float64 array of indices.
+        """
+        codes = pd.Categorical(values.astype("string"), categories=self.labels).codes.astype(np.float64)
+        codes[codes < 0] = len(self.labels)
+        return codes
+
+class IncidentScorer:
+    """
+    Scores incidents for a classification task outside of Spark. The fitted label indices, the ordered
+    feature list and the model are persisted together. The default logistic model is exported as plain
+    coefficient arrays with the standardization folded in, so scoring is a dot product: vectorized over
+    Parquet/CSV batches, and in a few microseconds for a single record.
+    """
+
+    ESTIMATORS = ["logistic", "gbt"]
+
+    def __init__(self, task="is_killed", estimator="logistic"):
+        """
+        Initializes an unfitted scorer.
+
+        Args:
+            task: "is_killed" or "severity".
+            estimator: "logistic" (exported linear model) or "gbt" (scikit-learn gradient boosted trees).
+        """
+        if task not in TASKS:
+            raise ValueError(f"Unknown task {task}; supported tasks are {sorted(TASKS)}.")
+        if estimator not in self.ESTIMATORS:
+            raise ValueError(f"Unknown estimator {estimator}; supported estimators are {self.ESTIMATORS}.")
+        self.task = task
+        self.estimator = estimator
+        self.classes = TASKS[task]["classes"]
+        self.features = [name for name, sql_type in parse_table_schema()
+                         if name not in TASKS[task]["dropped"] and (sql_type != "STRING" or name in INDEXED_COLUMNS)
+                         and sql_type != "DATE"]
+        self.indexes = {}
+        self.coef = None
+        self.intercept = None
+        self.model = None
+        self.metrics = {}
+
+    def feature_matrix(self, data_df):
+        """
+        Assembles the feature columns of a DataFrame into a float64 array, in `features` order.
+        """
+        X = np.empty((len(data_df), len(self.features)), dtype=np.float64)
+        for j, name in enumerate(self.features):
+            if name in self.indexes:
+                X[:, j] = self.indexes[name].transform(data_df[name])
+            else:
+                X[:, j] = pd.to_numeric(data_df[name], errors="coerce").fillna(0).to_numpy(dtype=np.float64)
+        return X
+
+    def fit(self, data_df, validation_fraction=CNT.SCORING_VALIDATION_FRACTION,
+            random_state=CNT.SCORING_RANDOM_STATE):
+        """
+        Fits the label indices and the model on a training split, weighting every class by
+        total / class count, and reports the validation metrics. The indices are fitted once on the
+        training split and reused for validation and scoring.
+
+        Args:
+            data_df: DataFrame of the cleaned data.
+            validation_fraction: Share of incidents held out for validation.
+            random_state: Seed of the split and the model.
+
+        Returns:
+            Dictionary of validation metrics.
+        """
+        # Imported here as only training needs scikit-learn, scoring an exported logistic model does not
+        from sklearn.linear_model import LogisticRegression
+        from sklearn.ensemble import HistGradientBoostingClassifier
+        from sklearn.preprocessing import StandardScaler
+        from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+
+        y = make_labels(self.task, data_df)
+        rng = np.random.default_rng(random_state)
+        is_validation = rng.random(len(data_df)) < validation_fraction
+        train_df = data_df[~is_validation]
+
+        self.indexes = {name: LabelIndex().fit(train_df[name]) for name in self.features if name in INDEXED_COLUMNS}
+        X_train, y_train = self.feature_matrix(train_df), y[~is_validation]
+        classes, counts = np.unique(y_train, return_counts=True)
+        sample_weight = (len(y_train) / counts)[np.searchsorted(classes, y_train)]
+
+        start = time.perf_counter()
+        if self.estimator == "logistic":
+            scaler = StandardScaler().fit(X_train)
+            scale = np.where(scaler.scale_ > 0, scaler.scale_, 1.0)
+            model = LogisticRegression(max_iter=1000, random_state=random_state)
+            model.fit((X_train - scaler.mean_) / scale, y_train, sample_weight=sample_weight)
+            # w.(x - mean) / scale + b == (w / scale).x + (b - w.(mean / scale))
+            self.coef = model.coef_ / scale
+            self.intercept = model.intercept_ - self.coef @ scaler.mean_
+        else:
+            self.model = HistGradientBoostingClassifier(random_state=random_state)
+            self.model.fit(X_train, y_train, sample_weight=sample_weight)
+        log_stage({"stage": "scoring.fit", "status": "ok", "elapsed_s": time.perf_counter() - start,
+                   "task": self.task, "estimator": self.estimator, "nrows": len(y_train)}, LOGGER)
+
+        y_valid = y[is_validation]
+        probabilities = self.predict_proba_matrix(self.feature_matrix(data_df[is_validation]))
+        y_pred = probabilities.argmax(axis=1)
+        self.metrics = {
+            "n_train": int(len(y_train)),
+            "n_validation": int(len(y_valid)),
+            "accuracy": float(accuracy_score(y_valid, y_pred)),
+            "f1": float(f1_score(y_valid, y_pred, average="binary" if len(self.classes) == 2 else "weighted")),
+        }
+        if len(self.classes) == 2 and len(np.unique(y_valid)) == 2:
+            self.metrics["auc"] = float(roc_auc_score(y_valid, probabilities[:, 1]))
+        LOGGER.info(f"Validation metrics: {self.metrics}")
+        return self.metrics
+
+    def predict_proba_matrix(self, X):
+        """
+        Returns the class probabilities of an assembled feature array, one column per class.
+        """
+        if self.estimator != "logistic":
+            return self.model.predict_proba(X)
+        logits = X @ self.coef.T + self.intercept
+        if logits.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-logits[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        logits -= logits.max(axis=1, keepdims=True)
+        exp = np.exp(logits)
+        return exp / exp.sum(axis=1, keepdims=True)
+
+    def predict_proba(self, data_df):
+        """
+        Returns the class probabilities of every incident of a DataFrame.
+        """
+        return self.predict_proba_matrix(self.feature_matrix(data_df))
+
+    def score_record(self, record):
+        """
+        Scores a single incident given as a dictionary of column values, without building a DataFrame.
+
+        Args:
+            record: Dictionary holding (at least) the feature columns; missing values count as 0.
+
+        Returns:
+            Tuple (predicted class, list of class probabilities).
+        """
+        x = np.empty(len(self.features), dtype=np.float64)
+        for j, name in enumerate(self.features):
+            value = record.get(name)
+            index = self.indexes.get(name)
+            if index is not None:
+                x[j] = index.lookup.get(value, len(index.labels))
+            else:
+                x[j] = 0.0 if value is None or pd.isna(value) else float(value)
+        probabilities = self.predict_proba_matrix(x[None, :])[0]
+        return self.classes[int(probabilities.argmax())], probabilities.tolist()
+
+    def save(self, model_dir=CNT.SCORING_MODEL_DIR):
+        """
+        Persists the label indices, the feature list and the model to `<model_dir>/<task>_<estimator>.json`,
+        plus a `.pkl` file for the gbt model.
+        """
+        os.makedirs(model_dir, exist_ok=True)
+        name = f"{self.task}_{self.estimator}"
+        spec = {"task": self.task, "estimator": self.estimator, "features": self.features,
+                "indexes": {column: index.labels for column, index in self.indexes.items()},
+                "metrics": self.metrics}
+        if self.estimator == "logistic":
+            spec["coef"] = self.coef.tolist()
+            spec["intercept"] = self.intercept.tolist()
+        else:
+            joblib.dump(self.model, os.path.join(model_dir, f"{name}.pkl"))
+        with open(os.path.join(model_dir, f"{name}.json"), "w") as f:
+            json.dump(spec, f, indent=2)
+        LOGGER.info(f"Saved the {name} scorer to {model_dir}.")
+
+    @classmethod
+    def load(cls, task="is_killed", estimator="logistic", model_dir=CNT.SCORING_MODEL_DIR):
+        """
+        Loads a scorer persisted with `save`.
+        """
+        name = f"{task}_{estimator}"
+        with open(os.path.join(model_dir, f"{name}.json")) as f:
+            spec = json.load(f)
+        scorer = cls(spec["task"], spec["estimator"])
+        scorer.features = spec["features"]
+        scorer.indexes = {column: LabelIndex(labels) for column, labels in spec["indexes"].items()}
+        scorer.metrics = spec["metrics"]
+        if scorer.estimator == "logistic":
+            scorer.coef = np.array(spec["coef"])
+            scorer.intercept = np.array(spec["intercept"])
+        else:
+            scorer.model = joblib.load(os.path.join(model_dir, f"{name}.pkl"))
+        return scorer
+
+def iter_batches(path, columns, batch_rows=CNT.SCORING_BATCH_ROWS):
+    """
+    Reads the given columns of an incident store, a Parquet file or dataset directory, or a CSV, in batches.
+
+    Returns:
+        Generator of DataFrames.
+    """
+    if path.endswith(".csv") or is_store(path):
+        yield from iter_incidents(path, columns, batch_rows)
+    else:
+        for batch in ds.dataset(path, format="parquet").to_batches(columns=columns, batch_size=batch_rows):
+            if batch.num_rows:
+                yield batch.to_pandas()
+
+def score_file(scorer, path, output_path, batch_rows=CNT.SCORING_BATCH_ROWS):
+    """
+    Scores every incident of a Parquet or CSV file in vectorized batches and writes incident_id, the
+    predicted class and the class probabilities to a CSV.
+
+    Args:
+        scorer: A fitted IncidentScorer.
+        path: Path of a CSV file, an incident store, a Parquet file or a Parquet dataset directory.
+        output_path: Path of the CSV to write.
+        batch_rows: Number of incidents per batch.
+
+    Returns:
+        Dictionary with the number of rows scored, the elapsed time and the throughput in rows per second.
+    """
+    start = time.perf_counter()
+    report = {"path": path, "output": output_path, "nrows": 0, "nbatches": 0}
+    columns = ["incident_id"] + scorer.features
+    for batch_df in iter_batches(path, columns, batch_rows):
+        probabilities = scorer.predict_proba(batch_df)
+        scores_df = pd.DataFrame(probabilities, columns=[f"probability_{label}" for label in scorer.classes])
+        scores_df.insert(0, "prediction", np.asarray(scorer.classes)[probabilities.argmax(axis=1)])
+        scores_df.insert(0, "incident_id", batch_df["incident_id"].to_numpy())
+        scores_df.to_csv(output_path, mode="a" if report["nbatches"] else "w", header=not report["nbatches"],
+                         index=False)
+        report["nrows"] += len(batch_df)
+        report["nbatches"] += 1
+    report["elapsed"] = time.perf_counter() - start
+    report["rows_per_sec"] = report["nrows"] / report["elapsed"] if report["elapsed"] else 0.0
+    log_stage({"stage": "scoring.score_file", "status": "ok", "elapsed_s": report["elapsed"], "path": path,
+               "nbatches": report["nbatches"], "nrows": report["nrows"]}, LOGGER)
+    return report
+
+def measure_latency(scorer, records):
+    """
+    Measures the single-record scoring latency over a list of records.
+
+    Returns:
+        Dictionary with the number of records and the p50, p95 and max latency in microseconds.
+    """
+    latencies = np.empty(len(records))
+    for i, record in enumerate(records):
+        start = time.perf_counter()
+        scorer.score_record(record)
+        latencies[i] = time.perf_counter() - start
+    latencies_us = latencies * 1e6
+    report = {"nrecords": len(records), "latency_us_p50": float(np.percentile(latencies_us, 50)),
+              "latency_us_p95": float(np.percentile(latencies_us, 95)), "latency_us_max": float(latencies_us.max())}
+    LOGGER.info(f"Single-record latency: p50 {report['latency_us_p50']:.1f}us, p95 {report['latency_us_p95']:.1f}us.")
+    return report
+
+def parse_args():
+    """
+    Parses the command line arguments of the scoring engine.
+    """
+    parser = argparse.ArgumentParser(description="Trains and serves the is_killed and severity classifiers.")
+    parser.add_argument("command", choices=["train", "score", "latency"],
+                        help="train: fit and persist a scorer; score: batch-score a file; "
+                             "latency: measure single-record scoring on a file's first rows.")
+    parser.add_argument("--task", choices=sorted(TASKS), default="is_killed")
+    parser.add_argument("--estimator", choices=IncidentScorer.ESTIMATORS, default="logistic")
+    parser.add_argument("--source", default=CNT.CLEANED_DATA_PATH, help="Cleaned data CSV, incident store, Parquet file or directory.")
+    parser.add_argument("--model-dir", default=CNT.SCORING_MODEL_DIR)
+    parser.add_argument("--output", default=None, help="CSV of scores written by score.")
+    parser.add_argument("--batch-rows", type=int, default=CNT.SCORING_BATCH_ROWS)
+    parser.add_argument("--n-records", type=int, default=10000, help="Number of records timed by latency.")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging()
+    if args.command == "train":
+        scorer = IncidentScorer(args.task, args.estimator)
+        columns = list(dict.fromkeys(scorer.features + ["n_killed", "n_injured"]))
+        scorer.fit(pd.concat(iter_batches(args.source, columns, args.batch_rows), ignore_index=True))
+        scorer.save(args.model_dir)
+    elif args.command == "score":
+        if not args.output:
+            raise SystemExit("score needs --output.")
+        score_file(IncidentScorer.load(args.task, args.estimator, args.model_dir), args.source, args.output,
+                   args.batch_rows)
+    else:
+        scorer = IncidentScorer.load(args.task, args.estimator, args.model_dir)
+        sample_df = next(iter_batches(args.source, scorer.features, args.n_records))
+        measure_latency(scorer, sample_df.to_dict("records"))
@@ -1,46 +1,204 @@
 import os
 import sys
+import time
+import queue
+import glob
+import json
+import logging
+import argparse
+import threading
+from datetime import timedelta
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import pandas as pd
-import snowflake.connector
-from snowflake.connector.pandas_tools import write_pandas
+import pyarrow as pa
+try:
+    import snowflake.connector
+    from snowflake.connector.pandas_tools import write_pandas
+except ImportError:
+    # The local DuckDB backend (scripts/local_warehouse.py) runs without the Snowflake connector
+    snowflake = None
+    write_pandas = None
 
 # Setting the path to import the constants module
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 import helper.constants as CNT
+from helper.schema import parse_table_schema
+from helper.instrumentation import get_logger, configure_logging, stage, log_stage
+from scripts.parquet_stage import csv_to_parquet
+from scripts.typed_reader import CoercionReport, read_typed_csv, iter_typed_csv
+from scripts.incident_store import IncidentStore, is_store
+
+LOGGER = get_logger("snowflake_sink")
+
+def statement_type(query):
+    """
+    Returns the statement type of a query (SELECT, MERGE, ...), logged instead of the query text.
+    """
+    words = query.split(None, 1)
+    return words[0].upper() if words else ""
+
+class SnowflakeConnectionPool:
+    """
+    A thread-safe pool of authenticated Snowflake sessions. Sessions are created with the warehouse,
+    database and schema already set, and are handed back to the pool instead of being closed so that
+    later callers skip the login and USE round trips.
+    """
+
+    def __init__(self, max_size=CNT.SF_POOL_SIZE, warehouse=CNT.SF_WAREHOUSE, database=CNT.SF_DATABASE,
+                 schema=CNT.SF_SCHEMA):
+        """
+        Initializes an empty pool.
+
+        :param max_size: Maximum number of live sessions.
+        :param warehouse: Warehouse set on every session.
+        :param database: Database set on every session.
+        :param schema: Schema set on every session.
+        """
+        self.max_size = max_size
+        self.env = (warehouse, database, schema)
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+
+    def _new_connection(self):
+        """
+        Opens a new authenticated session with the pool's environment.
+        """
+        if snowflake is None:
+            raise Exception("snowflake-connector-python is not installed.")
+        warehouse, database, schema = self.env
+        LOGGER.info(f"Opening pooled Snowflake session ({self._created}/{self.max_size} open)...")
+        return snowflake.connector.connect(
+            user=CNT.SF_USER,
+            password=CNT.SF_PASSWORD,
+            account=CNT.SF_ACCOUNT,
+            warehouse=warehouse,
+            database=database,
+            schema=schema,
+            client_session_keep_alive=True
+        )
+
+    def acquire(self, timeout=CNT.SF_POOL_TIMEOUT):
+        """
+        Hands out an idle session, opening a new one if the pool is not full, or waiting for one to be released.
+
+        :param timeout: Seconds to wait for a session when the pool is exhausted.
+        :return: A Snowflake connection object.
+        :raises Exception: If no session becomes available within the timeout.
+        """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            if not connection.is_closed():
+                return connection
+            with self._lock:
+                self._created -= 1
+
+        with self._lock:
+            can_create = self._created < self.max_size
+            if can_create:
+                self._created += 1
+        if can_create:
+            try:
+                return self._new_connection()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise Exception(f"No Snowflake session available after {timeout}s (pool size: {self.max_size}).")
+
+    def release(self, connection):
+        """
+        Returns a session to the pool.
+
+        :param connection: A connection obtained from `acquire`.
+        """
+        if connection.is_closed():
+            with self._lock:
+                self._created -= 1
+        else:
+            self._idle.put(connection)
+
+    def close_all(self):
+        """
+        Closes every idle session in the pool.
+        """
+        while True:
+            try:
+                connection = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            connection.close()
+            with self._lock:
+                self._created -= 1
+        LOGGER.info("Snowflake connection pool closed.")
+
+_POOL = None
+_POOL_LOCK = threading.Lock()
+
+def get_pool():
+    """
+    Returns the process-wide Snowflake session pool, creating it on first use.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = SnowflakeConnectionPool()
+        return _POOL
 
 class SnowflakeConnector:
     """
     A class to manage Snowflake connections and operations.
     """
 
-    def __init__(self):
+    def __init__(self, pooled=True):
         """
         Initializes the SnowflakeConnector instance. Sets the connection and cursor to None.
+
+        :param pooled: Whether `connect` borrows a session from the shared pool, which already has the
+                       warehouse, database and schema set, instead of logging in afresh. Only the
+                       environment setup, which creates that warehouse, database and schema, needs False.
         """
         self.connection = None
         self.cursor = None
+        self.pooled = pooled
+        self.env = None
 
     def connect(self):
         """
         Connects to the Snowflake database using credentials from the CNTants module.
-        Prints a success message upon connection or an error message if the connection fails.
+        Logs the connection as the "warehouse.connect" stage, or an error message if the connection fails.
         """
         try:
-            print("Attempting to connect to Snowflake...")
-            self.connection = snowflake.connector.connect(
-                user=CNT.SF_USER,
-                password=CNT.SF_PASSWORD,
-                account=CNT.SF_ACCOUNT
-            )
-            self.cursor = self.connection.cursor()
-            print("Successfully connected to Snowflake.")
+            with stage("warehouse.connect", LOGGER, backend="snowflake", pooled=self.pooled):
+                if self.pooled:
+                    self.connection = get_pool().acquire()
+                    self.env = get_pool().env
+                else:
+                    if snowflake is None:
+                        raise Exception("snowflake-connector-python is not installed.")
+                    LOGGER.info("Attempting to connect to Snowflake...")
+                    self.connection = snowflake.connector.connect(
+                        user=CNT.SF_USER,
+                        password=CNT.SF_PASSWORD,
+                        account=CNT.SF_ACCOUNT
+                    )
+                self.cursor = self.connection.cursor()
+            LOGGER.info("Successfully connected to Snowflake.")
         except Exception as e:
-            print(f"Error connecting to Snowflake: {e}")
+            LOGGER.error(f"Error connecting to Snowflake: {e}")
             raise
 
     def execute_query(self, query):
         """
-        Executes the provided SQL query using the Snowflake cursor.
+        Executes the provided SQL query using the Snowflake cursor. The query is timed as a DEBUG
+        "warehouse.query" stage recording the statement type and the number of result rows, never the rows.
         
         :param query: The SQL query to be executed.
         :return: The results of the query as a list of tuples.
@@ -49,15 +207,101 @@ class SnowflakeConnector:
         if not self.cursor:
             raise Exception("Not connected to Snowflake.")
         try:
-            print(f"Executing query: {query}")
-            self.cursor.execute(query)
-            result = self.cursor.fetchall()
-            print(f"Query executed successfully. Result: {result}")
+            LOGGER.debug(f"Executing query: {query}")
+            with stage("warehouse.query", LOGGER, logging.DEBUG, statement=statement_type(query)) as record:
+                self.cursor.execute(query)
+                result = self.cursor.fetchall()
+                record["nrows"] = len(result)
             return result
         except Exception as e:
-            print(f"Error executing query: {e}")
+            LOGGER.error(f"Error executing query: {e}")
             raise
 
+    def fetch_arrow(self, query, params=None):
+        """
+        Executes the provided SQL query and fetches the result in Arrow record batches.
+
+        :param query: The SQL query to be executed.
+        :param params: Optional query parameters bound by the connector.
+        :return: The result as a pyarrow Table.
+        :raises Exception: If the query execution fails or the cursor is not available.
+        """
+        if not self.cursor:
+            raise Exception("Not connected to Snowflake.")
+        try:
+            LOGGER.debug(f"Executing query: {query}")
+            with stage("warehouse.fetch_arrow", LOGGER, statement=statement_type(query)) as record:
+                self.cursor.execute(query, params)
+                batches = list(self.cursor.fetch_arrow_batches())
+                result = pa.concat_tables(batches) if batches else pa.table({})
+                record["nrows"] = result.num_rows
+            return result
+        except Exception as e:
+            LOGGER.error(f"Error executing query: {e}")
+            raise
+
+    def write_dataframe(self, data_df, table):
+        """
+        Bulk-writes a DataFrame into an existing table with write_pandas.
+
+        :param data_df: DataFrame whose (upper-case) columns match the table columns.
+        :param table: Name of the target table.
+        :return: Tuple (success, nchunks, nrows).
+        """
+        success, nchunks, nrows, _ = write_pandas(self.get_connection(), data_df, table.upper(),
+                                                  use_logical_type=True)
+        return success, nchunks, nrows
+
+    def copy_parquet(self, parquet_dir, table):
+        """
+        PUTs the Parquet files of `parquet_dir` to the table stage and COPYs them into the table.
+
+        :param parquet_dir: Directory holding the Parquet files.
+        :param table: Name of the target table.
+        :return: Tuple (success, nfiles, nrows).
+        """
+        # A sub-path per staging directory keeps concurrent bulk loads from copying each other's files
+        table_stage = f"@%{table.upper()}/{os.path.basename(os.path.normpath(parquet_dir))}"
+
+        LOGGER.info(f"Uploading Parquet files to {table_stage}...")
+        stage_pattern = os.path.join(os.path.abspath(parquet_dir), "*.parquet").replace("\\", "/")
+        self.execute_query(f"PUT 'file://{stage_pattern}' {table_stage} "
+                           f"PARALLEL={CNT.SF_PUT_PARALLEL} AUTO_COMPRESS=FALSE OVERWRITE=TRUE")
+
+        LOGGER.info(f"Copying staged files into {table}...")
+        copy_result = self.execute_query(
+            f"COPY INTO {table.upper()} FROM {table_stage} "
+            f"FILE_FORMAT=(TYPE=PARQUET) MATCH_BY_COLUMN_NAME=CASE_INSENSITIVE "
+            f"PATTERN='.*[.]parquet' PURGE=TRUE"
+        )
+        # Each COPY result row is (file, status, rows_parsed, rows_loaded, ...)
+        nrows = sum(row[3] for row in copy_result if isinstance(row[3], int))
+        success = all(row[1] in ("LOADED", "PARTIALLY_LOADED") for row in copy_result)
+        return success, len(copy_result), nrows
+
+    def merge_rows(self, merge_query):
+        """
+        Executes a MERGE statement.
+
+        :param merge_query: The MERGE statement.
+        :return: Tuple (rows_inserted, rows_updated).
+        """
+        merge_result = self.execute_query(merge_query)
+        return merge_result[0][0], merge_result[0][1]
+
+    def table_version(self, table):
+        """
+        Returns a value that changes whenever the table is modified (its LAST_ALTERED timestamp).
+
+        :param table: Name of the table.
+        :return: The version as a string, "missing" if the table does not exist.
+        """
+        result = self.execute_query(
+            "SELECT LAST_ALTERED FROM INFORMATION_SCHEMA.TABLES "
+            f"WHERE TABLE_SCHEMA = CURRENT_SCHEMA() AND TABLE_NAME = '{table.upper()}'"
+        )
+        return str(result[0][0]) if result else "missing"
+
     def setup_env(self, dw_name, db_name, schema_name):
         """
         Creates the data warehouse, database, and schema if they do not exist.
@@ -66,7 +310,7 @@ class SnowflakeConnector:
         :param db_name: Name of the database to be created.
         :param schema_name: Name of the schema to be created.
         """
-        print(f"Setting up environment: Data Warehouse '{dw_name}', Database '{db_name}', Schema '{schema_name}'")
+        LOGGER.info(f"Setting up environment: Data Warehouse '{dw_name}', Database '{db_name}', Schema '{schema_name}'")
         dw_query = f"CREATE WAREHOUSE IF NOT EXISTS {dw_name}"
         db_query = f"CREATE DATABASE IF NOT EXISTS {db_name}"
         schema_query = f"""CREATE SCHEMA IF NOT EXISTS {db_name}.{schema_name}"""
@@ -75,9 +319,9 @@ class SnowflakeConnector:
         self.execute_query(db_query)
         self.execute_query(schema_query)
 
-        print(f"Environment setup complete: Data Warehouse: {dw_name}, Database: {db_name}, Schema: {schema_name}")
+        LOGGER.info(f"Environment setup complete: Data Warehouse: {dw_name}, Database: {db_name}, Schema: {schema_name}")
 
-    def create_table(self, dw_name, db_name, schema_name, table_name, table_schema):
+    def create_table(self, dw_name, db_name, schema_name, table_name, table_schema, replace=True):
         """
         Creates a table in the specified data warehouse, database, and schema.
         
@@ -86,13 +330,17 @@ class SnowflakeConnector:
         :param schema_name: Name of the schema to be used.
         :param table_name: Name of the table to be created.
         :param table_schema: The schema of the table to be created.
+        :param replace: Whether an existing table is replaced. If False, an existing table and its rows are kept.
         """
-        print(f"Creating table '{table_name}' in {dw_name}.{db_name}.{schema_name}")
+        LOGGER.info(f"Creating table '{table_name}' in {dw_name}.{db_name}.{schema_name}")
         self.use_env(dw_name, db_name, schema_name)
-        table_query = f"CREATE OR REPLACE TABLE {table_name}{table_schema}"
+        if replace:
+            table_query = f"CREATE OR REPLACE TABLE {table_name}{table_schema}"
+        else:
+            table_query = f"CREATE TABLE IF NOT EXISTS {table_name}{table_schema}"
 
         self.execute_query(table_query)
-        print(f"Table '{table_name}' created successfully.")
+        LOGGER.info(f"Table '{table_name}' created successfully.")
 
     def use_env(self, dw_name, db_name, schema_name):
         """
@@ -102,11 +350,15 @@ class SnowflakeConnector:
         :param db_name: Name of the database to switch to.
         :param schema_name: Name of the schema to switch to.
         """
-        print(f"Switching to environment: Data Warehouse '{dw_name}', Database '{db_name}', Schema '{schema_name}'")
+        if self.env == (dw_name, db_name, schema_name):
+            LOGGER.debug(f"Already using environment: Data Warehouse '{dw_name}', Database '{db_name}', Schema '{schema_name}'")
+            return
+        LOGGER.info(f"Switching to environment: Data Warehouse '{dw_name}', Database '{db_name}', Schema '{schema_name}'")
         self.execute_query(f"USE WAREHOUSE {dw_name}")
         self.execute_query(f"USE DATABASE {db_name}")
         self.execute_query(f"USE SCHEMA {schema_name}")
-        print("Environment switched successfully.")
+        self.env = (dw_name, db_name, schema_name)
+        LOGGER.info("Environment switched successfully.")
 
     def get_connection(self):
         """
@@ -120,138 +372,543 @@ class SnowflakeConnector:
 
     def close(self):
         """
-        Closes the Snowflake connection and cursor. Prints a message indicating that the connection is closed.
+        Closes the Snowflake connection and cursor. Logs a message indicating that the connection is closed.
+        A pooled connection is returned to the pool with its session kept alive.
         """
         if self.cursor:
             self.cursor.close()
+            self.cursor = None
         if self.connection:
-            self.connection.close()
-        print("Snowflake connection closed.")
+            if self.pooled:
+                if self.env != get_pool().env:
+                    # Restore the pool's environment so the next borrower gets the session it expects
+                    self.use_env(*get_pool().env)
+                get_pool().release(self.connection)
+                LOGGER.info("Snowflake connection returned to the pool.")
+            else:
+                self.connection.close()
+                LOGGER.info("Snowflake connection closed.")
+            self.connection = None
+        self.env = None
+
+def create_connector(backend=CNT.WAREHOUSE_BACKEND, pooled=True):
+    """
+    Creates an (unconnected) connector for the given warehouse backend.
+    :param backend: "snowflake", or "duckdb" for the embedded local stand-in warehouse.
+    :param pooled: Whether a Snowflake connector borrows its session from the shared pool.
+    :return: A SnowflakeConnector or one of its local stand-ins.
+    """
+    if backend == "snowflake":
+        return SnowflakeConnector(pooled=pooled)
+    if backend == "duckdb":
+        from scripts.local_warehouse import DuckDBConnector
+        return DuckDBConnector()
+    raise ValueError(f"Unknown warehouse backend: {backend}")
 
 class SnowFlakeSink:
-    def __init__(self):
-        self.sf_connection = SnowflakeConnector()
-        print("Connecting to Snowflake...")
-        self.sf_connection.connect()
-        print(f"Using environment with Warehouse: {CNT.SF_WAREHOUSE}, Database: {CNT.SF_DATABASE}, Schema: {CNT.SF_SCHEMA}")
+    def __init__(self, sf_connection=None, backend=CNT.WAREHOUSE_BACKEND):
+        """
+        Initializes the sink on the given connector, or on a new connector for `backend`
+        (a session borrowed from the shared pool for Snowflake).
+        :param sf_connection: Optional connected SnowflakeConnector to reuse.
+        :param backend: Warehouse backend used when no connector is given.
+        """
+        if sf_connection is None:
+            sf_connection = create_connector(backend)
+            LOGGER.info("Connecting to Snowflake...")
+            sf_connection.connect()
+        self.sf_connection = sf_connection
+        LOGGER.info(f"Using environment with Warehouse: {CNT.SF_WAREHOUSE}, Database: {CNT.SF_DATABASE}, Schema: {CNT.SF_SCHEMA}")
         self.sf_connection.use_env(CNT.SF_WAREHOUSE, CNT.SF_DATABASE, CNT.SF_SCHEMA)
+        self.coercion_report = CoercionReport()
+
+    def upper_columns(self, data_df):
+        """
+        Upper-cases the column names to match the Snowflake table columns.
+        :param data_df: DataFrame read from the cleaned data file
+        :return: The same DataFrame
+        """
+        data_df.columns = data_df.columns.str.upper()
+        return data_df
 
     def get_data(self, path):
         """
-        Reads data from the specified path and returns it as a DataFrame.
-        :param path: The path to the data file (CSV)
+        Reads data from the specified path and returns it as a DataFrame. Every column is parsed straight
+        into the compact dtype derived from SF_TABLE_SCHEMA, and values that could not be parsed are
+        coerced to NaN and counted in `self.coercion_report`. An incident store directory is opened
+        directly, its columns are already typed.
+        :param path: The path to the data file (CSV) or to an incident store directory
         :return: DataFrame containing the data read from the file
         """
         try:
-            print(f"Reading data from {path}...")
-            data_df = pd.read_csv(path)
-            data_df['incident_id'] = pd.to_numeric(data_df['incident_id'], errors='coerce')  
-            data_df['date'] = pd.to_datetime(data_df['date'], errors='coerce').dt.date
-            data_df['state'] = data_df['state'].astype(str)  
-            data_df['city_or_county'] = data_df['city_or_county'].astype(str)  
-            data_df['address'] = data_df['address'].astype(str)  
-            data_df['n_killed'] = pd.to_numeric(data_df['n_killed'], errors='coerce')  
-            data_df['n_injured'] = pd.to_numeric(data_df['n_injured'], errors='coerce')  
-            data_df['congressional_district'] = pd.to_numeric(data_df['congressional_district'], errors='coerce')  
-            data_df['incident_characteristics'] = data_df['incident_characteristics'].astype(str)  
-            data_df['latitude'] = pd.to_numeric(data_df['latitude'], errors='coerce')  
-            data_df['longitude'] = pd.to_numeric(data_df['longitude'], errors='coerce')  
-            data_df['n_guns_involved'] = pd.to_numeric(data_df['n_guns_involved'], errors='coerce')  
-            data_df['notes'] = data_df['notes'].astype(str)  
-            data_df['year'] = pd.to_numeric(data_df['year'], errors='coerce')  
-            data_df['month'] = pd.to_numeric(data_df['month'], errors='coerce')  
-            data_df['day_of_week'] = pd.to_numeric(data_df['day_of_week'], errors='coerce')  
-
-            # Convert frequency columns
-            freq_columns = [
-                'gun_stolen_not_stolen_freq', 'gun_stolen_stolen_freq', 
-                'gun_stolen_unknown_freq', 'gun_type_ak_freq', 
-                'gun_type_auto_freq', 'gun_type_gauge_freq', 
-                'gun_type_handgun_freq', 'gun_type_lr_freq', 
-                'gun_type_mag_freq', 'gun_type_mm_freq', 
-                'gun_type_rem_ar_freq', 'gun_type_rifle_freq', 
-                'gun_type_shotgun_freq', 'gun_type_spl_freq', 
-                'gun_type_spr_freq', 'gun_type_sw_freq', 
-                'gun_type_unknown_freq', 'gun_type_win_freq', 
-                'participant_age_group_adult_18plus_freq', 
-                'participant_age_group_child_0_11_freq', 
-                'participant_age_group_teen_12_17_freq', 
-                'participant_gender_female_freq', 
-                'participant_gender_male_freq', 
-                'participant_status_arrested_freq', 
-                'participant_status_injured_freq', 
-                'participant_status_killed_freq', 
-                'participant_status_unharmed_freq', 
-                'participant_type_subject_suspect_freq', 
-                'participant_type_victim_freq'
-            ]
-
-            for col in freq_columns:
-                data_df[col] = pd.to_numeric(data_df[col], errors='coerce')
-            data_df.columns = [col.upper() for col in data_df.columns]
-            print(f"Data read successfully. Shape: {data_df.shape}")
+            LOGGER.info(f"Reading data from {path}...")
+            with stage("sink.get_data", LOGGER, path=path) as record:
+                self.coercion_report = CoercionReport()
+                if is_store(path):
+                    data_df = IncidentStore(path).to_pandas()
+                    self.coercion_report.add(len(data_df))
+                else:
+                    data_df = read_typed_csv(path, report=self.coercion_report)
+                data_df = self.upper_columns(data_df)
+                record.update(nrows=len(data_df), rows_coerced=self.coercion_report.rows_coerced,
+                              memory_mb=round(data_df.memory_usage(deep=True).sum() / 1024 ** 2, 1))
+            LOGGER.info(f"Type coercion: {self.coercion_report}")
             return data_df
         except Exception as e:
-            print(f"An error occurred while reading data from {path}: {e}")
+            LOGGER.error(f"An error occurred while reading data from {path}: {e}")
             return None
 
+    def estimate_chunksize(self, path, max_memory_mb=CNT.SF_INGEST_MAX_MEMORY_MB,
+                           queue_depth=CNT.SF_INGEST_QUEUE_DEPTH):
+        """
+        Estimates how many rows can be read per chunk so that the chunks held in memory at once
+        (queued chunks, the chunk being parsed and the chunk being uploaded) stay under the memory ceiling.
+        :param path: The path to the data file (CSV)
+        :param max_memory_mb: Memory ceiling for in-flight chunks, in megabytes
+        :param queue_depth: Number of parsed chunks allowed to wait for upload
+        :return: Number of rows per chunk
+        """
+        sample_df = read_typed_csv(path, nrows=CNT.SF_INGEST_SAMPLE_ROWS)
+        if sample_df.empty:
+            return CNT.SF_INGEST_SAMPLE_ROWS
+        bytes_per_row = sample_df.memory_usage(deep=True).sum() / len(sample_df)
+        # write_pandas serializes each chunk to a temporary parquet file, hence the factor of two
+        in_flight_chunks = 2 * (queue_depth + 2)
+        chunksize = int(max_memory_mb * 1024 * 1024 / (bytes_per_row * in_flight_chunks))
+        return max(chunksize, 1)
+
+    def iter_chunks(self, path, chunksize):
+        """
+        Reads the data file in chunks of at most `chunksize` rows and yields each chunk with coerced types.
+        :param path: The path to the data file (CSV)
+        :param chunksize: Number of rows per chunk
+        :return: Generator of DataFrames
+        """
+        self.coercion_report = CoercionReport()
+        for chunk_df in iter_typed_csv(path, chunksize, report=self.coercion_report):
+            yield self.upper_columns(chunk_df)
+
+    def write_table_streaming(self, path, table, max_memory_mb=CNT.SF_INGEST_MAX_MEMORY_MB,
+                              queue_depth=CNT.SF_INGEST_QUEUE_DEPTH):
+        """
+        Streams the data file to the specified Snowflake table chunk by chunk. A reader thread parses and
+        coerces the next chunks while the current one is being uploaded, and the bounded queue between them
+        keeps peak memory under `max_memory_mb`.
+        :param path: The path to the data file.
+        :param table: The target Snowflake table where data will be written.
+        :param max_memory_mb: Memory ceiling for in-flight chunks, in megabytes
+        :param queue_depth: Number of parsed chunks allowed to wait for upload
+        :return: Dictionary with the load summary (success, nchunks, nrows, elapsed)
+        """
+        report = {"path": path, "table": table, "success": False, "nchunks": 0, "nrows": 0, "elapsed": 0.0}
+        start = time.perf_counter()
+        try:
+            chunksize = self.estimate_chunksize(path, max_memory_mb, queue_depth)
+            LOGGER.info(f"Streaming data at: {path} to table: {table} in chunks of {chunksize} rows "
+                        f"(memory ceiling: {max_memory_mb} MB)")
+
+            chunk_queue = queue.Queue(maxsize=queue_depth)
+            stop_event = threading.Event()
+            reader = threading.Thread(target=self._produce_chunks,
+                                      args=(path, chunksize, chunk_queue, stop_event),
+                                      daemon=True)
+            reader.start()
+
+            success = True
+            try:
+                while True:
+                    item = chunk_queue.get()
+                    if item is None:
+                        break
+                    if isinstance(item, Exception):
+                        raise item
+
+                    with stage("sink.write_chunk", LOGGER, table=table, chunk=report["nchunks"] + 1) as record:
+                        chunk_success, _, chunk_rows = self.sf_connection.write_dataframe(item, table)
+                        record.update(nrows=chunk_rows, success=chunk_success)
+                    success = success and chunk_success
+                    report["nchunks"] += 1
+                    report["nrows"] += chunk_rows
+                    if not chunk_success:
+                        LOGGER.error(f"Failed to write chunk {report['nchunks']} to {table}.")
+            finally:
+                stop_event.set()
+                reader.join()
+
+            report["success"] = success
+            report["coercion"] = self.coercion_report.summary()
+            LOGGER.info(f"Type coercion: {self.coercion_report}")
+        except Exception as e:
+            LOGGER.error(f"An error occurred while streaming to the table {table}: {e}")
+        report["elapsed"] = time.perf_counter() - start
+        self._log_load("sink.write_streaming", report)
+        return report
+
+    def _produce_chunks(self, path, chunksize, chunk_queue, stop_event):
+        """
+        Reader thread body for `write_table_streaming`. Puts coerced chunks on the queue, followed by
+        None once the file is exhausted, or the raised exception if reading fails.
+        """
+        def put(item):
+            while not stop_event.is_set():
+                try:
+                    chunk_queue.put(item, timeout=0.5)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        try:
+            for chunk_df in self.iter_chunks(path, chunksize):
+                if not put(chunk_df):
+                    return
+            put(None)
+        except Exception as e:
+            put(e)
+
     def write_table(self, path, table):
         """
         Reads data from the specified path and writes it to the specified Snowflake table.
         :param path: The path to the data file.
         :param table: The target Snowflake table where data will be written.
+        :return: Dictionary with the load summary (success, nchunks, nrows, elapsed)
         """
+        report = {"path": path, "table": table, "success": False, "nchunks": 0, "nrows": 0, "elapsed": 0.0}
+        start = time.perf_counter()
         try:
-            print(f"Reading and writing data at: {path} to table: {table}")
+            LOGGER.info(f"Reading and writing data at: {path} to table: {table}")
             data_df = self.get_data(path)
 
             if data_df is not None:
-                print(f"Writing data to {table}...")
-                success, nchunks, nrows, _ = write_pandas(self.sf_connection.get_connection(), data_df, table.upper())
+                with stage("sink.write_dataframe", LOGGER, table=table) as record:
+                    success, nchunks, nrows = self.sf_connection.write_dataframe(data_df, table)
+                    record.update(nrows=nrows, nchunks=nchunks, success=success)
+                report.update(success=success, nchunks=nchunks, nrows=nrows,
+                              coercion=self.coercion_report.summary())
 
-                if success:
-                    print(f"Data written successfully to {table}. Number of chunks: {nchunks}, Number of rows: {nrows}")
-                else:
-                    print(f"Failed to write data to {table}.")
+                if not success:
+                    LOGGER.error(f"Failed to write data to {table}.")
             else:
-                print(f"No data to write for the table {table}.")
+                LOGGER.warning(f"No data to write for the table {table}.")
         
         except Exception as e:
-            print(f"An error occurred while writing to the table {table}: {e}")
+            LOGGER.error(f"An error occurred while writing to the table {table}: {e}")
+        report["elapsed"] = time.perf_counter() - start
+        self._log_load("sink.write_table", report)
+        return report
+
+    def write_table_parquet(self, path, table, parquet_dir=CNT.PARQUET_STAGE_DIR):
+        """
+        Stages the data file as typed Parquet files (converting it only if the staged files are stale),
+        PUTs them to the table stage and COPYs them into the specified Snowflake table.
+        :param path: The path to the data file (CSV).
+        :param table: The target Snowflake table where data will be written.
+        :param parquet_dir: Directory holding the staged Parquet files.
+        :return: Dictionary with the load summary (success, nchunks, nrows, elapsed)
+        """
+        report = {"path": path, "table": table, "success": False, "nchunks": 0, "nrows": 0, "elapsed": 0.0}
+        start = time.perf_counter()
+        try:
+            with stage("sink.stage_parquet", LOGGER, path=path, parquet_dir=parquet_dir):
+                csv_to_parquet(path, parquet_dir)
+            with stage("sink.copy_parquet", LOGGER, table=table) as record:
+                report["success"], report["nchunks"], report["nrows"] = self.sf_connection.copy_parquet(parquet_dir,
+                                                                                                       table)
+                record.update(nrows=report["nrows"], nfiles=report["nchunks"])
+        except Exception as e:
+            LOGGER.error(f"An error occurred while copying Parquet files to the table {table}: {e}")
+        report["elapsed"] = time.perf_counter() - start
+        self._log_load("sink.write_table_parquet", report)
+        return report
+
+    def get_high_water_mark(self, table):
+        """
+        Returns the highest incident id and date already loaded into the specified Snowflake table.
+        :param table: The Snowflake table to inspect.
+        :return: Tuple (max_incident_id, max_date), both None if the table is empty.
+        """
+        result = self.sf_connection.execute_query(f"SELECT MAX(INCIDENT_ID), MAX(DATE) FROM {table.upper()}")
+        return result[0] if result else (None, None)
+
+    def iter_delta_chunks(self, path, high_water_mark, lookback_days=CNT.SF_INCREMENTAL_LOOKBACK_DAYS,
+                          chunksize=CNT.SF_INCREMENTAL_CHUNK_ROWS):
+        """
+        Yields the rows of the data file that are new or may have changed since the high-water mark: incidents
+        with a higher id, or dated within `lookback_days` of the latest loaded date (GVA revises recent incidents).
+        :param path: The path to the data file (CSV)
+        :param high_water_mark: Tuple (max_incident_id, max_date) as returned by `get_high_water_mark`
+        :param lookback_days: Number of days before the latest loaded date whose incidents are re-staged
+        :param chunksize: Number of rows read per chunk
+        :return: Generator of DataFrames holding only the delta rows
+        """
+        max_id, max_date = high_water_mark
+        cutoff = max_date - timedelta(days=lookback_days) if max_date is not None else None
+        for chunk_df in self.iter_chunks(path, chunksize):
+            if max_id is None and cutoff is None:
+                yield chunk_df
+                continue
+            is_delta = pd.Series(False, index=chunk_df.index)
+            if max_id is not None:
+                is_delta |= chunk_df['INCIDENT_ID'] > max_id
+            if cutoff is not None:
+                is_delta |= chunk_df['DATE'] >= pd.Timestamp(cutoff)
+            if is_delta.any():
+                yield chunk_df[is_delta]
+
+    def merge_table(self, path, table, lookback_days=CNT.SF_INCREMENTAL_LOOKBACK_DAYS):
+        """
+        Incrementally loads the data file into the specified Snowflake table. Only the rows past the table's
+        high-water mark are staged into a temporary table, which is then MERGEd into the target on incident_id:
+        new incidents are inserted and existing ones are updated only if any of their values changed.
+        :param path: The path to the data file (CSV)
+        :param table: The target Snowflake table where data will be merged.
+        :param lookback_days: Number of days before the latest loaded date whose incidents are re-staged
+        :return: Dictionary with the load summary (success, nchunks, nrows, inserted, updated, elapsed)
+        """
+        report = {"path": path, "table": table, "success": False, "nchunks": 0, "nrows": 0,
+                  "inserted": 0, "updated": 0, "elapsed": 0.0}
+        start = time.perf_counter()
+        target = table.upper()
+        stage_table = f"{target}_DELTA"
+        try:
+            high_water_mark = self.get_high_water_mark(target)
+            report["high_water_mark"] = [str(value) if value is not None else None for value in high_water_mark]
+            LOGGER.info(f"High-water mark of {table}: incident_id={high_water_mark[0]}, date={high_water_mark[1]}")
+
+            with stage("sink.stage_delta", LOGGER, table=stage_table) as record:
+                self.sf_connection.execute_query(f"CREATE OR REPLACE TEMPORARY TABLE {stage_table} AS "
+                                                 f"SELECT * FROM {target} LIMIT 0")
+                for delta_df in self.iter_delta_chunks(path, high_water_mark, lookback_days):
+                    success, nchunks, nrows = self.sf_connection.write_dataframe(delta_df, stage_table)
+                    if not success:
+                        raise Exception(f"Failed to stage delta rows into {stage_table}.")
+                    report["nchunks"] += nchunks
+                    report["nrows"] += nrows
+                record["nrows"] = report["nrows"]
+
+            if report["nrows"]:
+                with stage("sink.merge_rows", LOGGER, table=table) as record:
+                    report["inserted"], report["updated"] = self.sf_connection.merge_rows(
+                        self._merge_query(target, stage_table))
+                    record.update(inserted=report["inserted"], updated=report["updated"])
+            report["success"] = True
+        except Exception as e:
+            LOGGER.error(f"An error occurred while merging into the table {table}: {e}")
+        finally:
+            try:
+                self.sf_connection.execute_query(f"DROP TABLE IF EXISTS {stage_table}")
+            except Exception as e:
+                LOGGER.warning(f"Could not drop the staging table {stage_table}: {e}")
+        report["elapsed"] = time.perf_counter() - start
+        self._log_load("sink.merge_table", report)
+        return report
+
+    def _merge_query(self, target, stage):
+        """
+        Builds the MERGE statement upserting the staged rows into the target table on incident_id.
+        """
+        columns = [name.upper() for name, _ in parse_table_schema()]
+        value_columns = [name for name in columns if name != "INCIDENT_ID"]
+        changed = " OR ".join(f"tgt.{name} IS DISTINCT FROM src.{name}" for name in value_columns)
+        updates = ", ".join(f"{name} = src.{name}" for name in value_columns)
+        insert_columns = ", ".join(columns)
+        insert_values = ", ".join(f"src.{name}" for name in columns)
+        return (f"MERGE INTO {target} tgt USING {stage} src ON tgt.INCIDENT_ID = src.INCIDENT_ID "
+                f"WHEN MATCHED AND ({changed}) THEN UPDATE SET {updates} "
+                f"WHEN NOT MATCHED THEN INSERT ({insert_columns}) VALUES ({insert_values})")
+
+    def _log_load(self, name, report):
+        """
+        Logs a load summary as one structured stage record and passes it to the timing hooks.
+        """
+        record = {"stage": name, "status": "ok" if report["success"] else "error", "elapsed_s": report["elapsed"]}
+        record.update((key, report[key]) for key in ("path", "table", "nchunks", "nrows", "inserted", "updated")
+                      if key in report)
+        log_stage(record, LOGGER, logging.INFO if report["success"] else logging.ERROR)
+
+    def close(self):
+        """
+        Closes the Snowflake connection held by the sink.
+        """
+        self.sf_connection.close()
+
+def resolve_data_files(source):
+    """
+    Expands a directory or glob pattern into the sorted list of data files it refers to.
+    :param source: A directory (all CSV files in it are used) or a glob pattern.
+    :return: Sorted list of file paths.
+    """
+    if os.path.isdir(source):
+        source = os.path.join(source, "*.csv")
+    return sorted(path for path in glob.glob(source) if os.path.isfile(path))
+
+def bulk_write_tables(source, table, max_workers=CNT.SF_BULK_MAX_WORKERS, stream=False,
+                      max_memory_mb=CNT.SF_INGEST_MAX_MEMORY_MB, parquet=False, backend=CNT.WAREHOUSE_BACKEND):
+    """
+    Loads every data file matched by `source` into the specified Snowflake table using a pool of worker
+    threads. Each worker opens its own SnowFlakeSink (and therefore its own Snowflake connection) and
+    reuses it for all the files it picks up.
+    :param source: A directory or glob pattern of data files (e.g. one file per year or state).
+    :param table: The target Snowflake table where data will be written.
+    :param max_workers: Number of worker threads (and Snowflake connections).
+    :param stream: Whether each file is loaded with the chunked streaming mode.
+    :param max_memory_mb: Memory ceiling per worker when streaming, in megabytes.
+    :param parquet: Whether each file is staged as Parquet and loaded with PUT/COPY.
+    :param backend: Warehouse backend, "snowflake" or "duckdb".
+    :return: Dictionary with the aggregated load report and the per-file results.
+    """
+    paths = resolve_data_files(source)
+    report = {"source": source, "table": table, "nfiles": len(paths), "nchunks": 0, "nrows": 0,
+              "failed": [], "elapsed": 0.0, "files": []}
+    if not paths:
+        LOGGER.warning(f"No data files found for: {source}")
+        return report
+
+    LOGGER.info(f"Bulk loading {len(paths)} files from {source} to table: {table} with {max_workers} workers")
+    worker_state = threading.local()
+    sinks = []
+    sinks_lock = threading.Lock()
+
+    def load_file(path):
+        if not hasattr(worker_state, "sink"):
+            worker_state.sink = SnowFlakeSink(backend=backend)
+            with sinks_lock:
+                sinks.append(worker_state.sink)
+        if parquet:
+            parquet_dir = os.path.join(CNT.PARQUET_STAGE_DIR, os.path.splitext(os.path.basename(path))[0])
+            return worker_state.sink.write_table_parquet(path, table, parquet_dir=parquet_dir)
+        if stream:
+            return worker_state.sink.write_table_streaming(path, table, max_memory_mb=max_memory_mb)
+        return worker_state.sink.write_table(path, table)
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(load_file, path): path for path in paths}
+            for future in as_completed(futures):
+                path = futures[future]
+                try:
+                    file_report = future.result()
+                except Exception as e:
+                    LOGGER.error(f"An error occurred while loading {path}: {e}")
+                    file_report = {"path": path, "table": table, "success": False,
+                                   "nchunks": 0, "nrows": 0, "elapsed": 0.0}
+                report["files"].append(file_report)
+    finally:
+        for sink in sinks:
+            sink.close()
+
+    report["files"].sort(key=lambda file_report: file_report["path"])
+    report["elapsed"] = time.perf_counter() - start
+    for file_report in report["files"]:
+        report["nchunks"] += file_report["nchunks"]
+        report["nrows"] += file_report["nrows"]
+        if not file_report["success"]:
+            report["failed"].append(file_report["path"])
+
+    log_load_report(report)
+    return report
+
+def log_load_report(report):
+    """
+    Logs the aggregated report produced by `bulk_write_tables`, the totals as a "sink.bulk" stage record.
+    :param report: The bulk load report.
+    """
+    LOGGER.info(f"Load report for table {report['table']}:")
+    for file_report in report["files"]:
+        status = "OK" if file_report["success"] else "FAILED"
+        LOGGER.info(f"  {status:6} {file_report['path']}: {file_report['nrows']} rows, "
+                    f"{file_report['nchunks']} chunks, {file_report['elapsed']:.2f}s")
+    log_stage({"stage": "sink.bulk", "status": "error" if report["failed"] else "ok",
+               "elapsed_s": report["elapsed"], "table": report["table"], "nfiles": report["nfiles"],
+               "failed": len(report["failed"]), "nchunks": report["nchunks"], "nrows": report["nrows"]},
+              LOGGER, logging.ERROR if report["failed"] else logging.INFO)
+
+def parse_args():
+    """
+    Parses the command line arguments of the sink process.
+    """
+    parser = argparse.ArgumentParser(description="Loads the cleaned GVA data into Snowflake.")
+    parser.add_argument("command", nargs="?", default="sink", choices=["setup", "sink", "bulk"],
+                        help="'setup' creates the warehouse, database, schema and table; 'sink' loads the data; "
+                             "'bulk' loads every file matched by --source")
+    parser.add_argument("--stream", action="store_true",
+                        help="Read and upload the data file in bounded-size chunks")
+    parser.add_argument("--parquet", action="store_true",
+                        help="Stage the data file as Parquet and load it with PUT/COPY")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Merge only new or recently changed incidents into the existing table")
+    parser.add_argument("--max-memory-mb", type=int, default=CNT.SF_INGEST_MAX_MEMORY_MB,
+                        help="Memory ceiling for in-flight chunks when streaming")
+    parser.add_argument("--backend", default=CNT.WAREHOUSE_BACKEND, choices=["snowflake", "duckdb"],
+                        help="Warehouse backend; 'duckdb' loads into the local stand-in warehouse")
+    parser.add_argument("--source", default=os.path.dirname(CNT.CLEANED_DATA_PATH),
+                        help="Directory or glob pattern of data files for the 'bulk' command")
+    parser.add_argument("--workers", type=int, default=CNT.SF_BULK_MAX_WORKERS,
+                        help="Number of parallel workers for the 'bulk' command")
+    parser.add_argument("--report", default=None,
+                        help="Optional path of a JSON file to write the bulk load report to")
+    return parser.parse_args()
 
 if __name__ == "__main__":
-    print("Starting the SnowFlake Sink Process:")
-    print("Starting the SnowFlake Process:")
-    sf = SnowflakeConnector()
+    args = parse_args()
+    configure_logging()
+    LOGGER.info("Starting the SnowFlake Sink Process:")
+    # The warehouse, database and schema may not exist yet during setup, so only the load paths use the pool
+    sf = create_connector(args.backend, pooled=args.command != "setup")
 
     try:
-        print("Connecting to Snowflake...")
-        sf.connect()
+        if args.command != "bulk":
+            LOGGER.info("Connecting to Snowflake...")
+            sf.connect()
         
-        if len(sys.argv) > 1:
-            print(f"Setting up environment with Warehouse: {CNT.SF_WAREHOUSE}, "
-                  f"Database: {CNT.SF_DATABASE}, Schema: {CNT.SF_SCHEMA}...")
+        if args.command == "setup":
+            LOGGER.info(f"Setting up environment with Warehouse: {CNT.SF_WAREHOUSE}, "
+                        f"Database: {CNT.SF_DATABASE}, Schema: {CNT.SF_SCHEMA}...")
             sf.setup_env(dw_name=CNT.SF_WAREHOUSE,
                          db_name=CNT.SF_DATABASE,
                          schema_name=CNT.SF_SCHEMA)
 
-            print(f"Creating table '{CNT.SF_TABLE_NAME}'...")
+            LOGGER.info(f"Creating table '{CNT.SF_TABLE_NAME}'...")
             sf.create_table(dw_name=CNT.SF_WAREHOUSE,
                             db_name=CNT.SF_DATABASE,
                             schema_name=CNT.SF_SCHEMA,
                             table_name=CNT.SF_TABLE_NAME,
                             table_schema=CNT.SF_TABLE_SCHEMA)
-            print(f"Table '{CNT.SF_TABLE_NAME}' created successfully.")
+            LOGGER.info(f"Table '{CNT.SF_TABLE_NAME}' created successfully.")
+        elif args.command == "bulk":
+            LOGGER.info("Implementing bulk sink process...")
+            load_report = bulk_write_tables(args.source, CNT.SF_TABLE_NAME, max_workers=args.workers,
+                                            stream=args.stream, max_memory_mb=args.max_memory_mb,
+                                            parquet=args.parquet, backend=args.backend)
+            if args.report:
+                with open(args.report, "w") as report_file:
+                    json.dump(load_report, report_file, indent=2)
+                LOGGER.info(f"Load report written to {args.report}")
         else:
-            print("No arguments passed. Implementing sink process...")
-            sf_sink = SnowFlakeSink()
-            sf_sink.write_table(CNT.CLEANED_DATA_PATH, CNT.SF_TABLE_NAME)
-            sf_sink.sf_connection.close()
+            LOGGER.info("Implementing sink process...")
+            sf_sink = SnowFlakeSink(sf)
+            if args.incremental:
+                sf_sink.sf_connection.create_table(dw_name=CNT.SF_WAREHOUSE,
+                                                   db_name=CNT.SF_DATABASE,
+                                                   schema_name=CNT.SF_SCHEMA,
+                                                   table_name=CNT.SF_TABLE_NAME,
+                                                   table_schema=CNT.SF_TABLE_SCHEMA,
+                                                   replace=False)
+                sf_sink.merge_table(CNT.CLEANED_DATA_PATH, CNT.SF_TABLE_NAME)
+            elif args.parquet:
+                sf_sink.write_table_parquet(CNT.CLEANED_DATA_PATH, CNT.SF_TABLE_NAME)
+            elif args.stream:
+                sf_sink.write_table_streaming(CNT.CLEANED_DATA_PATH, CNT.SF_TABLE_NAME,
+                                              max_memory_mb=args.max_memory_mb)
+            else:
+                sf_sink.write_table(CNT.CLEANED_DATA_PATH, CNT.SF_TABLE_NAME)
     
     except Exception as e:
-        print(f"An error occurred: {e}")
+        LOGGER.error(f"An error occurred: {e}")
     
     finally:
-        print("Closing Snowflake connection...")
+        LOGGER.info("Closing Snowflake connection...")
         sf.close()
-        print("Connection closed.")
\ No newline at end of file
+        get_pool().close_all()
+        LOGGER.info("Connection closed.")
\ No newline at end of file
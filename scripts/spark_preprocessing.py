@@ -0,0 +1,344 @@
+import os
+import sys
+import json
+import glob
+import time
+import argparse
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+from pyspark.sql.types import (
+    StructType, StructField, IntegerType, StringType, BooleanType, DateType, DoubleType)
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.schema import parse_table_schema
+from helper.freq_encoding import GUN_COLUMNS, UNKNOWN_PATTERN, VALUE_DELIMITER, freq_targets
+from helper.instrumentation import get_logger, configure_logging, log_stage
+
+LOGGER = get_logger("spark_preprocessing")
+
+RAW_SCHEMA = StructType([
+    StructField("incident_id", IntegerType(), True),
+    StructField("date", DateType(), True),
+    StructField("state", StringType(), True),
+    StructField("city_or_county", StringType(), True),
+    StructField("address", StringType(), True),
+    StructField("n_killed", IntegerType(), True),
+    StructField("n_injured", IntegerType(), True),
+    StructField("incident_url", StringType(), True),
+    StructField("source_url", StringType(), True),
+    StructField("incident_url_fields_missing", BooleanType(), True),
+    StructField("congressional_district", IntegerType(), True),
+    StructField("gun_stolen", StringType(), True),
+    StructField("gun_type", StringType(), True),
+    StructField("incident_characteristics", StringType(), True),
+    StructField("latitude", DoubleType(), True),
+    StructField("location_description", StringType(), True),
+    StructField("longitude", DoubleType(), True),
+    StructField("n_guns_involved", IntegerType(), True),
+    StructField("notes", StringType(), True),
+    StructField("participant_age", StringType(), True),
+    StructField("participant_age_group", StringType(), True),
+    StructField("participant_gender", StringType(), True),
+    StructField("participant_name", StringType(), True),
+    StructField("participant_relationship", StringType(), True),
+    StructField("participant_status", StringType(), True),
+    StructField("participant_type", StringType(), True),
+    StructField("sources", StringType(), True),
+    StructField("state_house_district", IntegerType(), True),
+    StructField("state_senate_district", IntegerType(), True)
+])
+
+STREET_TYPE_MAPPING = {
+    "Street": "St",
+    "Avenue": "Ave",
+    "Road": "Rd",
+    "Boulevard": "Blvd",
+    "Lane": "Ln",
+    "Drive": "Dr",
+    "Circle": "Cir",
+    "Court": "Ct",
+    "Terrace": "Ter",
+    "Place": "Pl",
+    "Highway": "Hwy",
+}
+
+SPECIAL_CHARS_PATTERN = r"[^a-zA-Z0-9\s,'_()-]"
+MISSING_TEXT_COLUMNS = ["incident_characteristics", "notes", "address"]
+MISSING_VALUES = {"congressional_district": -1, "latitude": -99.0, "longitude": -99.0, "n_guns_involved": 0}
+
+# Spark type of each SQL type of the cleaned table schema
+SPARK_TYPES = {"INTEGER": "int", "DATE": "date", "STRING": "string", "DOUBLE": "double"}
+
+MANIFEST_NAME = "_processed_files.json"
+
+def get_spark(app_name=CNT.SPARK_APP_NAME, master=None):
+    """
+    Returns the active Spark session, creating it if needed.
+
+    Args:
+        app_name: Name of the Spark application.
+        master: Optional Spark master URL, e.g. "local[*]".
+    """
+    builder = SparkSession.builder.appName(app_name)
+    if master:
+        builder = builder.master(master)
+    return builder.getOrCreate()
+
+def read_raw(spark, paths):
+    """
+    Reads raw GVA CSV files with the raw data schema.
+
+    Args:
+        spark: The Spark session.
+        paths: List of raw CSV file paths.
+
+    Returns:
+        A Spark DataFrame.
+    """
+    return spark.read.option("header", "True") \
+                .option("quote", '"') \
+                .option("escape", '"') \
+                .option("sep", ",") \
+                .option("ignoreLeadingWhiteSpace", "True") \
+                .option("ignoreTrailingWhiteSpace", "True") \
+                .option("multiLine", "True") \
+                .option("mode", "PERMISSIVE") \
+                .csv(paths, schema=RAW_SCHEMA)
+
+def abbreviate_street_types(address):
+    """
+    Builds the column expression replacing full street type names of an address with their abbreviations.
+
+    Args:
+        address: The address column.
+
+    Returns:
+        The column expression.
+    """
+    for full, abbr in STREET_TYPE_MAPPING.items():
+        address = F.regexp_replace(address, f"\\b{full}\\b", abbr)
+    return address
+
+def clean_unknown_values(value):
+    """
+    Builds the column expression removing 'n::Unknown' and 'n:Unknown' entries of a delimited column
+    while preserving the valid entries.
+
+    Args:
+        value: The delimited column.
+
+    Returns:
+        The column expression.
+    """
+    value = F.regexp_replace(value, UNKNOWN_PATTERN, "")
+    value = F.regexp_replace(value, r"\|\|+", "||")
+    return F.trim(F.regexp_replace(value, r"^\|\||\|\|$", ""))
+
+def _unknown_if_empty(value):
+    value = F.when(value == "", "Unknown").otherwise(value)
+    return F.when(value == "Other", "Unknown").otherwise(value)
+
+def normalize_gun_value(value):
+    """
+    Normalizes one entry of a gun column, e.g. "0::9mm" to "mm" or "1::Other" to "unknown".
+    """
+    value = F.regexp_replace(value, r"(:|::)", "")
+    value = F.regexp_replace(value, r"\d+", "")
+    value = F.regexp_replace(value, r"[\[\]{}()]", "")
+    value = F.regexp_replace(value, r"\s*[-_.]\s*", " ")
+    value = F.lower(F.trim(_unknown_if_empty(value)))
+    return F.regexp_replace(value, r"\s+", "_")
+
+def normalize_participant_value(value):
+    """
+    Normalizes one entry of a participant column, e.g. "0::Adult 18+" to "adult_18plus".
+    """
+    value = F.regexp_replace(value, r"(:|::)", "")
+    value = F.regexp_replace(value, r"\+", "plus")
+    value = F.regexp_replace(value, r"^\d+", "")
+    value = F.lower(F.trim(_unknown_if_empty(value)))
+    return F.regexp_replace(value, r"[\s-]+", "_")
+
+def frequency_columns():
+    """
+    Builds one column expression per *_freq column of the table schema. Each delimited column is split
+    into an array of normalized values and every frequency is the size of a filter over that array, so
+    all the encodings are computed row-wise in a single projection, without explode, pivot or joins.
+
+    Returns:
+        Dictionary of *_freq column name to its column expression.
+    """
+    expressions = {}
+    for source_col, value_targets in freq_targets().items():
+        normalize = normalize_gun_value if source_col in GUN_COLUMNS else normalize_participant_value
+        values = F.transform(F.split(clean_unknown_values(F.col(source_col)), VALUE_DELIMITER), normalize)
+
+        values_by_freq_col = {}
+        for value, freq_cols in value_targets.items():
+            for freq_col in freq_cols:
+                values_by_freq_col.setdefault(freq_col, []).append(value)
+        for freq_col, freq_values in values_by_freq_col.items():
+            count = F.size(F.filter(values, lambda value: value.isin(freq_values)))
+            expressions[freq_col] = F.when(F.col(source_col).isNull(), F.lit(0)).otherwise(count)
+    return expressions
+
+def clean_text(value):
+    """
+    Builds the column expression normalizing a free text column: delimiters become "; ", punctuation is
+    removed and the text is lower-cased.
+    """
+    value = F.regexp_replace(value, r"\|{1,2}", "; ")
+    value = F.regexp_replace(value, r"/", " ")
+    value = F.regexp_replace(value, r"[^\w\s;]", "")
+    return F.lower(F.trim(F.regexp_replace(value, r"\s{2,}", " ")))
+
+def fix_notes(value):
+    """
+    Builds the column expression fixing the trailing numbers and common typos of the notes column.
+    """
+    value = F.regexp_replace(value, r"[\d\s\.]+$", "")
+    value = F.regexp_replace(value, r"\s*;\s*$", "")
+    value = F.regexp_replace(value, r"\byr\b", "year")
+    value = F.regexp_replace(value, r"\binured\b", "injured")
+    return F.trim(F.regexp_replace(value, r"\s+", " "))
+
+def preprocess(raw_df):
+    """
+    Applies the cleaning of the preprocessing notebook to raw GVA data. Every step is a native column
+    expression evaluated in one projection, so the data is never shuffled or collected to the driver.
+
+    Args:
+        raw_df: Spark DataFrame read with RAW_SCHEMA.
+
+    Returns:
+        Spark DataFrame with the columns of the cleaned table schema, in table order.
+    """
+    columns = {
+        "state": F.initcap(F.trim(F.col("state"))),
+        "city_or_county": F.regexp_replace(F.trim(F.col("city_or_county")), SPECIAL_CHARS_PATTERN, ""),
+        "address": abbreviate_street_types(F.trim(F.regexp_replace(F.col("address"), SPECIAL_CHARS_PATTERN, ""))),
+        "year": F.year("date"),
+        "month": F.month("date"),
+        "day_of_week": F.dayofweek("date"),
+        "incident_characteristics": clean_text(F.col("incident_characteristics")),
+        "notes": fix_notes(clean_text(F.col("notes"))),
+    }
+    columns.update(frequency_columns())
+
+    for col_name in MISSING_TEXT_COLUMNS:
+        columns[col_name] = F.coalesce(columns.get(col_name, F.col(col_name)), F.lit("missing"))
+    for col_name, fill_value in MISSING_VALUES.items():
+        columns[col_name] = F.coalesce(columns.get(col_name, F.col(col_name)), F.lit(fill_value))
+
+    return raw_df.select(*[
+        columns.get(name, F.col(name)).cast(SPARK_TYPES[sql_type]).alias(name)
+        for name, sql_type in parse_table_schema()
+    ])
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime}
+
+def load_manifest(output_dir):
+    """
+    Returns the raw files already written to `output_dir`, as a dictionary of path to fingerprint.
+    """
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(output_dir, manifest):
+    """
+    Records the raw files written to `output_dir`.
+    """
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+def resolve_raw_files(source):
+    """
+    Expands a raw CSV file, a directory of raw CSV files or a glob pattern into a sorted list of files.
+    """
+    if os.path.isdir(source):
+        source = os.path.join(source, "*.csv")
+    return sorted(os.path.abspath(path) for path in glob.glob(source) if os.path.isfile(path))
+
+def run_pipeline(spark, source=CNT.RAW_DATA_PATH, output_dir=CNT.CLEANED_PARQUET_DIR, full_refresh=False,
+                 csv_dir=None):
+    """
+    Cleans the raw files of `source` and writes them as Parquet partitioned by year. Raw files already
+    recorded in the output's manifest are skipped, so a re-run only processes newly added files and
+    appends their partitions. Files that changed since they were processed need a full refresh.
+
+    Args:
+        spark: The Spark session.
+        source: A raw CSV file, a directory of raw CSV files or a glob pattern.
+        output_dir: Directory of the partitioned Parquet dataset.
+        full_refresh: Whether every raw file is processed again and the output is overwritten.
+        csv_dir: Optional directory to also write the cleaned rows to as CSV part files with a header,
+                 loadable with `snowflake_sink.py bulk --source <csv_dir>`.
+
+    Returns:
+        Dictionary with the processed files, the skipped files, the number of rows written from the new files
+        and the elapsed time.
+    """
+    start = time.perf_counter()
+    manifest = {} if full_refresh else load_manifest(output_dir)
+    raw_files = resolve_raw_files(source)
+    new_files = [path for path in raw_files if path not in manifest]
+    changed_files = [path for path in raw_files if path in manifest and manifest[path] != _fingerprint(path)]
+    report = {"source": source, "output": output_dir, "processed": new_files, "changed": changed_files,
+              "skipped": len(raw_files) - len(new_files), "nrows": 0, "elapsed": 0.0}
+
+    if changed_files:
+        LOGGER.warning(f"Raw files changed since they were processed, re-run with --full-refresh to reload them: {changed_files}")
+    if not new_files:
+        LOGGER.info(f"No new raw files to process in {source}.")
+        return report
+
+    LOGGER.info(f"Processing {len(new_files)} raw files: {new_files}")
+    # Persisted so the count and the writes share one read and cleaning pass of the raw files
+    cleaned_df = preprocess(read_raw(spark, new_files)).persist()
+    try:
+        report["nrows"] = cleaned_df.count()
+        mode = "overwrite" if full_refresh else "append"
+        cleaned_df.write.mode(mode).partitionBy(*CNT.CLEANED_PARTITION_COLUMNS).parquet(output_dir)
+        if csv_dir:
+            cleaned_df.write.mode(mode).option("header", "True").csv(csv_dir)
+    finally:
+        cleaned_df.unpersist()
+
+    manifest.update({path: _fingerprint(path) for path in new_files})
+    save_manifest(output_dir, manifest)
+    report["elapsed"] = time.perf_counter() - start
+    log_stage({"stage": "spark.run_pipeline", "status": "ok", "elapsed_s": report["elapsed"], "output": output_dir,
+               "nfiles": len(new_files), "nrows": report["nrows"]}, LOGGER)
+    return report
+
+def parse_args():
+    """
+    Parses the command line arguments of the preprocessing pipeline.
+    """
+    parser = argparse.ArgumentParser(description="Cleans raw GVA data into a partitioned Parquet dataset.")
+    parser.add_argument("--source", default=CNT.RAW_DATA_PATH,
+                        help="Raw CSV file, directory of raw CSV files or glob pattern.")
+    parser.add_argument("--output", default=CNT.CLEANED_PARQUET_DIR,
+                        help="Directory of the partitioned Parquet output.")
+    parser.add_argument("--csv-dir", default=None,
+                        help="Also write the cleaned rows as CSV part files to this directory.")
+    parser.add_argument("--full-refresh", action="store_true",
+                        help="Process every raw file again and overwrite the output.")
+    parser.add_argument("--master", default=None, help="Spark master URL, e.g. local[*].")
+    return parser.parse_args()
+
+if __name__ == "__main__":
+    args = parse_args()
+    configure_logging()
+    spark = get_spark(master=args.master)
+    try:
+        run_pipeline(spark, args.source, args.output, args.full_refresh, args.csv_dir)
+    finally:
+        spark.stop()
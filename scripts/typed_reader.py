@@ -0,0 +1,194 @@
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+# Setting the path to import the constants module
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+from helper.schema import pandas_dtypes
+
+# The schema is parsed once into the dtype map applied by every read
+DTYPES, DATE_COLUMNS = pandas_dtypes()
+NUMERIC_COLUMNS = [name for name, dtype in DTYPES.items() if dtype not in ("object", "category")]
+INTEGER_COLUMNS = [name for name in NUMERIC_COLUMNS if pd.api.types.is_integer_dtype(pd.api.types.pandas_dtype(DTYPES[name]))]
+# Integer columns are parsed as Int64 and narrowed only after a range check, since a narrow read_csv dtype
+# silently wraps values that do not fit
+PARSE_DTYPES = {name: ("Int64" if name in INTEGER_COLUMNS else dtype) for name, dtype in DTYPES.items()}
+
+class CoercionReport:
+    """
+    Counts the values that could not be parsed as their schema type and were coerced to NaN.
+    """
+
+    def __init__(self):
+        """
+        Initializes an empty report.
+        """
+        self.rows_read = 0
+        self.rows_coerced = 0
+        self.coerced_by_column = {}
+
+    def add(self, nrows, coerced_mask_by_column=None):
+        """
+        Records a parsed chunk.
+
+        Args:
+            nrows: Number of rows in the chunk.
+            coerced_mask_by_column: Optional dict of column name to boolean Series flagging coerced values.
+        """
+        self.rows_read += nrows
+        if not coerced_mask_by_column:
+            return
+        any_coerced = None
+        for col, mask in coerced_mask_by_column.items():
+            count = int(mask.sum())
+            if count:
+                self.coerced_by_column[col] = self.coerced_by_column.get(col, 0) + count
+            any_coerced = mask if any_coerced is None else any_coerced | mask
+        if any_coerced is not None:
+            self.rows_coerced += int(any_coerced.sum())
+
+    def summary(self):
+        """
+        Returns the report as a dictionary.
+        """
+        return {"rows_read": self.rows_read, "rows_coerced": self.rows_coerced,
+                "coerced_by_column": dict(self.coerced_by_column)}
+
+    def __str__(self):
+        if not self.rows_coerced:
+            return f"{self.rows_read} rows read, no values coerced to NaN."
+        columns = ", ".join(f"{col}: {count}" for col, count in sorted(self.coerced_by_column.items()))
+        return f"{self.rows_read} rows read, {self.rows_coerced} rows with values coerced to NaN ({columns})."
+
+def _strict_kwargs(columns=None):
+    """
+    read_csv arguments that parse every column (or the given columns) straight into its schema dtype.
+    """
+    date_columns = [col for col in DATE_COLUMNS if columns is None or col in columns]
+    return {"usecols": columns, "dtype": PARSE_DTYPES, "parse_dates": date_columns, "date_format": CNT.DATE_FORMAT}
+
+def _lenient_kwargs(columns=None):
+    """
+    read_csv arguments for the fallback path: numeric and date columns are read as text and coerced afterwards.
+    """
+    dtypes = dict(DTYPES)
+    for col in NUMERIC_COLUMNS + DATE_COLUMNS:
+        dtypes[col] = "object"
+    return {"usecols": columns, "dtype": dtypes}
+
+def _narrow_integer(values, col):
+    """
+    Casts parsed numeric values to the compact integer dtype of `col`, after setting the values that are
+    not integral or do not fit the dtype to NaN.
+
+    Returns:
+        Tuple (narrowed Series, boolean mask of the values set to NaN).
+    """
+    bounds = np.iinfo(pd.api.types.pandas_dtype(DTYPES[col]).numpy_dtype)
+    as_float = values.astype("float64")
+    invalid = as_float.notna() & ((as_float % 1 != 0) | (as_float < bounds.min) | (as_float > bounds.max))
+    if invalid.any():
+        values = values.mask(invalid)
+    return values.astype(DTYPES[col]), invalid
+
+def _coerce_lenient(data_df):
+    """
+    Coerces the text-read numeric and date columns of a fallback chunk, returning the coerced-value masks.
+    """
+    masks = {}
+    for col in NUMERIC_COLUMNS:
+        if col not in data_df:
+            continue
+        raw = data_df[col]
+        parsed = pd.to_numeric(raw, errors='coerce')
+        masks[col] = raw.notna() & parsed.isna()
+        if col in INTEGER_COLUMNS:
+            parsed, invalid = _narrow_integer(parsed, col)
+            masks[col] |= invalid
+        data_df[col] = parsed.astype(DTYPES[col], copy=False)
+    for col in DATE_COLUMNS:
+        if col not in data_df:
+            continue
+        raw = data_df[col]
+        parsed = pd.to_datetime(raw, errors='coerce', format=CNT.DATE_FORMAT)
+        masks[col] = raw.notna() & parsed.isna()
+        data_df[col] = parsed
+    return masks
+
+def _finish_strict(data_df, report):
+    """
+    Narrows the integer columns read as Int64 to their compact dtypes, and coerces date columns that
+    read_csv left as text because some values did not match the date format.
+    """
+    masks = {}
+    for col in INTEGER_COLUMNS:
+        if col in data_df:
+            data_df[col], invalid = _narrow_integer(data_df[col], col)
+            if invalid.any():
+                masks[col] = invalid
+    for col in DATE_COLUMNS:
+        if col in data_df and not pd.api.types.is_datetime64_any_dtype(data_df[col]):
+            raw = data_df[col]
+            parsed = pd.to_datetime(raw, errors='coerce', format=CNT.DATE_FORMAT)
+            masks[col] = raw.notna() & parsed.isna()
+            data_df[col] = parsed
+    report.add(len(data_df), masks)
+    return data_df
+
+def read_typed_csv(path, nrows=None, report=None, columns=None):
+    """
+    Reads the cleaned data file with every column parsed directly into its compact schema dtype.
+    If a numeric value cannot be parsed, the file is re-read on a lenient path that coerces such values
+    to NaN and records them in the report. Integer values that are out of range for their compact dtype are
+    coerced to NaN and recorded as well.
+
+    Args:
+        path: Path of the cleaned data CSV.
+        nrows: Optional number of rows to read.
+        report: Optional CoercionReport to record coerced values in.
+        columns: Optional list of columns to read, all columns by default.
+
+    Returns:
+        A pandas DataFrame with lower-case column names as in the file.
+    """
+    report = report if report is not None else CoercionReport()
+    try:
+        return _finish_strict(pd.read_csv(path, nrows=nrows, **_strict_kwargs(columns)), report)
+    except (ValueError, TypeError, OverflowError):
+        data_df = pd.read_csv(path, nrows=nrows, **_lenient_kwargs(columns))
+        report.add(len(data_df), _coerce_lenient(data_df))
+        return data_df
+
+def iter_typed_csv(path, chunksize, report=None, columns=None):
+    """
+    Reads the cleaned data file in chunks of at most `chunksize` rows, each parsed into the schema dtypes.
+    If a chunk fails to parse, reading resumes from that chunk on the lenient path.
+
+    Args:
+        path: Path of the cleaned data CSV.
+        chunksize: Number of rows per chunk.
+        report: Optional CoercionReport to record coerced values in.
+        columns: Optional list of columns to read, all columns by default.
+
+    Returns:
+        Generator of pandas DataFrames.
+    """
+    report = report if report is not None else CoercionReport()
+    rows_done = 0
+    try:
+        with pd.read_csv(path, chunksize=chunksize, **_strict_kwargs(columns)) as reader:
+            for chunk_df in reader:
+                chunk_df = _finish_strict(chunk_df, report)
+                rows_done += len(chunk_df)
+                yield chunk_df
+        return
+    except (ValueError, TypeError, OverflowError):
+        pass
+
+    skiprows = range(1, rows_done + 1) if rows_done else None
+    with pd.read_csv(path, chunksize=chunksize, skiprows=skiprows, **_lenient_kwargs(columns)) as reader:
+        for chunk_df in reader:
+            report.add(len(chunk_df), _coerce_lenient(chunk_df))
+            yield chunk_df
@@ -1,18 +1,153 @@
+import os
+import json
+import html
+import re
+import hashlib
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
 import seaborn as sns
 import matplotlib.pyplot as plt
 from matplotlib import ticker
+import numpy as np
 import pandas as pd
-from wordcloud import WordCloud
+from wordcloud import WordCloud, STOPWORDS
+from helper.instrumentation import get_logger, stage
+
+LOGGER = get_logger("visualizations")
+
+TOKEN_PATTERN = re.compile(r"\w[\w']+")
+
+def _count_tokens(texts, stopwords=STOPWORDS):
+    """
+    Counts the lower-cased word tokens of a chunk of texts, leaving out stopwords and numbers.
+
+    Args:
+        texts: Iterable of strings.
+        stopwords: Set of words to ignore.
+    """
+    counts = Counter()
+    for text in texts:
+        counts.update(token for token in TOKEN_PATTERN.findall(text.lower())
+                      if token not in stopwords and not token.isdigit())
+    return counts
+
+def _render_panel(task):
+    """
+    Worker body of `Visualization.render_panels`: draws one panel with the Agg backend and saves it.
+
+    Args:
+        task: Tuple (plot_name, col, data, large_data_threshold, panel_size, path).
+    """
+    plot_name, col, data, large_data_threshold, panel_size, path = task
+    plt.switch_backend('Agg')
+    viz = Visualization(data.to_frame(), large_data_threshold=large_data_threshold)
+    fig, ax = plt.subplots(figsize=panel_size)
+    try:
+        getattr(viz, plot_name)(ax, col)
+        fig.tight_layout()
+        fig.savefig(path)
+    finally:
+        plt.close(fig)
+    return path
 
 class Visualization:
-    def __init__(self, df):
+    # Above this many rows, scatter and distribution plots switch to their large-data mode
+    LARGE_DATA_THRESHOLD = 100_000
+    # Grid size of the binned KDE used in large-data mode
+    KDE_GRID_SIZE = 1024
+    # Number of points kept by the stratified downsampling of scatter plots
+    SCATTER_SAMPLE_SIZE = 20_000
+
+    def __init__(self, df, large_data_threshold=LARGE_DATA_THRESHOLD):
         """
         Initializes the class with a DataFrame.
 
         Args:
             df: A Pandas DataFrame
+            large_data_threshold: Row count above which scatter and distribution plots aggregate the data.
         """
         self.df = df
+        self.large_data_threshold = large_data_threshold
+        self._aggregates = {}
+
+    @classmethod
+    def from_store(cls, store_dir=None, columns=None, large_data_threshold=LARGE_DATA_THRESHOLD, **filters):
+        """
+        Creates a Visualization over incidents read from the memory-mapped incident store instead of the CSV.
+
+        Args:
+            store_dir: Directory of the incident store, defaults to INCIDENT_STORE_DIR.
+            columns: Optional list of columns to read.
+            large_data_threshold: Row count above which scatter and distribution plots aggregate the data.
+            **filters: Optional start, end, states and years predicates of `IncidentStore.table`.
+        """
+        from scripts.incident_store import IncidentStore
+
+        store = IncidentStore(store_dir) if store_dir else IncidentStore()
+        return cls(store.to_pandas(columns, **filters), large_data_threshold=large_data_threshold)
+
+    def cached_aggregate(self, key, compute):
+        """
+        Returns the aggregate stored under `key`, computing and storing it on first use.
+
+        Args:
+            key: Tuple (operation, columns...) identifying the aggregate.
+            compute: Function computing the aggregate from the DataFrame.
+        """
+        if key not in self._aggregates:
+            self._aggregates[key] = compute()
+        return self._aggregates[key]
+
+    def invalidate(self, col=None):
+        """
+        Drops cached aggregates. Call it after modifying the DataFrame.
+
+        Args:
+            col: Only drop the aggregates that involve this column. All aggregates are dropped if None.
+        """
+        if col is None:
+            self._aggregates.clear()
+        else:
+            self._aggregates = {key: value for key, value in self._aggregates.items() if col not in key[1:]}
+
+    def value_counts(self, col):
+        """
+        Value counts of a column, sorted by decreasing frequency (cached).
+
+        Args:
+            col: The column name.
+        """
+        return self.cached_aggregate(('value_counts', col), lambda: self.df[col].value_counts())
+
+    def years(self, date_col):
+        """
+        Year of each row parsed from a date column (cached), leaving the DataFrame untouched.
+
+        Args:
+            date_col: The column name for the date.
+        """
+        return self.cached_aggregate(
+            ('years', date_col),
+            lambda: pd.to_datetime(self.df[date_col], errors='coerce').dt.year.rename('year'))
+
+    def yearly_sums(self, date_col, value_cols):
+        """
+        Per-year sums of the value columns (cached per column). Columns not cached yet are
+        summed together in a single groupby.
+
+        Args:
+            date_col: The column name for the date.
+            value_cols: List of column names to sum.
+
+        Returns:
+            DataFrame indexed by year with one column per value column.
+        """
+        missing = [col for col in value_cols if ('yearly_sum', date_col, col) not in self._aggregates]
+        if missing:
+            sums = self.df[missing].groupby(self.years(date_col)).sum()
+            for col in missing:
+                self._aggregates[('yearly_sum', date_col, col)] = sums[col]
+        return pd.concat([self._aggregates[('yearly_sum', date_col, col)] for col in value_cols], axis=1)
 
     def format_func(self, value, tick_number):
         """
@@ -52,6 +187,74 @@ class Visualization:
         plt.tight_layout()
         plt.show()
 
+    def panel_fingerprint(self, plot_name, col, fmt, panel_size):
+        """
+        Fingerprint of a panel: changes whenever the column data or the rendering settings change.
+
+        Args:
+            plot_name: Name of the plot method, e.g. 'bar_plot'.
+            col: The column name.
+            fmt: Output file format.
+            panel_size: Tuple for panel size.
+        """
+        digest = hashlib.sha256(pd.util.hash_pandas_object(self.df[col], index=False).values.tobytes())
+        digest.update(f'{plot_name}|{col}|{fmt}|{panel_size}|{self.large_data_threshold}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def render_panels(self, cols, plt_fn, out_dir, fmt='png', panel_size=(10, 8), max_workers=None):
+        """
+        Headless, parallel alternative to combined_plot: renders one file per column in a process pool
+        using the Agg backend, skips panels whose data and settings have not changed since the last run,
+        and writes an HTML report linking every panel.
+
+        Args:
+            cols: List of column names to plot.
+            plt_fn: Plot method (e.g. viz.bar_plot) or its name; it must take (ax, col).
+            out_dir: Directory for the panel files and the report.
+            fmt: Output format, 'png' or 'svg'.
+            panel_size: Tuple for the size of each panel.
+            max_workers: Number of worker processes, defaults to the CPU count.
+
+        Returns:
+            Path of the HTML report.
+        """
+        plot_name = plt_fn if isinstance(plt_fn, str) else plt_fn.__name__
+        os.makedirs(out_dir, exist_ok=True)
+        manifest_path = os.path.join(out_dir, 'manifest.json')
+        manifest = {}
+        if os.path.exists(manifest_path):
+            with open(manifest_path) as manifest_file:
+                manifest = json.load(manifest_file)
+
+        tasks = []
+        files = []
+        for col in cols:
+            file_name = f'{plot_name}_{col}.{fmt}'
+            fingerprint = self.panel_fingerprint(plot_name, col, fmt, panel_size)
+            files.append((col, file_name))
+            path = os.path.join(out_dir, file_name)
+            if manifest.get(file_name) == fingerprint and os.path.exists(path):
+                continue
+            manifest[file_name] = fingerprint
+            tasks.append((plot_name, col, self.df[col], self.large_data_threshold, panel_size, path))
+
+        with stage('viz.render_panels', LOGGER, plot=plot_name, rendered=len(tasks), skipped=len(cols) - len(tasks)):
+            if tasks:
+                with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                    list(executor.map(_render_panel, tasks))
+
+        with open(manifest_path, 'w') as manifest_file:
+            json.dump(manifest, manifest_file, indent=2)
+
+        report_path = os.path.join(out_dir, f'{plot_name}_report.html')
+        with open(report_path, 'w') as report_file:
+            report_file.write(f'<html><head><title>{html.escape(plot_name)}</title></head><body>\n')
+            for col, file_name in files:
+                report_file.write(f'<figure><img src="{html.escape(file_name)}" alt="{html.escape(col)}" '
+                                  f'width="800"><figcaption>{html.escape(col)}</figcaption></figure>\n')
+            report_file.write('</body></html>\n')
+        return report_path
+
     def bar_plot(self, ax, col):
         """
         Bar plot for categorical columns.
@@ -60,7 +263,7 @@ class Visualization:
             ax: The axes to plot on.
             col: The column name for which to create the bar plot.
         """
-        value_counts = self.df[col].value_counts().sort_values(ascending=False)
+        value_counts = self.value_counts(col).sort_values(ascending=False)
         if len(value_counts) > 8:
             value_counts = value_counts.head(8)
             
@@ -72,16 +275,75 @@ class Visualization:
 
         ax.yaxis.set_major_formatter(ticker.FuncFormatter(self.format_func))
 
+    def annotate_reduction(self, ax, text):
+        """
+        Notes on the plot how the data was reduced in large-data mode.
+
+        Args:
+            ax: The axes to annotate.
+            text: The note.
+        """
+        ax.text(0.99, 0.99, text, transform=ax.transAxes, ha='right', va='top', fontsize=10,
+                color='dimgray', bbox=dict(facecolor='white', alpha=0.7, edgecolor='none'))
+
+    def binned_kde(self, values, grid_size=KDE_GRID_SIZE):
+        """
+        Gaussian KDE evaluated on a regular grid by binning the values and convolving the bin counts
+        with the kernel through an FFT, so the cost depends on the grid size rather than the row count.
+
+        Args:
+            values: 1-D array of finite values.
+            grid_size: Number of grid points.
+
+        Returns:
+            Tuple (grid, density) of arrays.
+        """
+        n = len(values)
+        low, high = values.min(), values.max()
+        if high == low:
+            high = low + 1.0
+        # Silverman's rule of thumb bandwidth, 0.9 * min(std, IQR / 1.34) * n^(-1/5); the IQR is left out when
+        # it is zero, as for count columns where most values are equal
+        q1, q3 = np.percentile(values, [25, 75])
+        spread = min(values.std(), (q3 - q1) / 1.34) if q3 > q1 else values.std()
+        bandwidth = 0.9 * spread * n ** (-1 / 5) or (high - low) / grid_size
+        low, high = low - 3 * bandwidth, high + 3 * bandwidth
+        counts, edges = np.histogram(values, bins=grid_size, range=(low, high))
+        grid = (edges[:-1] + edges[1:]) / 2
+        step = edges[1] - edges[0]
+
+        offsets = (np.arange(grid_size) - grid_size // 2) * step
+        kernel = np.exp(-0.5 * (offsets / bandwidth) ** 2)
+        kernel /= kernel.sum()
+        # Zero-padded FFT convolution, keeping the part aligned with the grid
+        size = 2 * grid_size
+        smoothed = np.fft.irfft(np.fft.rfft(counts, size) * np.fft.rfft(kernel, size), size)
+        smoothed = smoothed[grid_size // 2:grid_size // 2 + grid_size]
+        density = np.clip(smoothed, 0, None) / (n * step)
+        return grid, density
+
     def dist_plot(self, ax, col, bins=30):
         """
-        Distribution plot for numerical columns.
+        Distribution plot for numerical columns. Above the large-data threshold, the histogram is
+        computed with numpy and the KDE is a binned FFT estimate instead of seaborn's exact KDE.
 
         Args:
             ax: The axes to plot on.
             col: The column name for which to create the distribution plot.
             bins: Number of bins for the histogram.
         """
-        sns.histplot(self.df[col], bins=bins, ax=ax, kde=True, color='blue')
+        if len(self.df) > self.large_data_threshold:
+            values = pd.to_numeric(self.df[col], errors='coerce').to_numpy(dtype=float)
+            values = values[np.isfinite(values)]
+            counts, edges = np.histogram(values, bins=bins)
+            ax.stairs(counts, edges, fill=True, color='blue', alpha=0.4)
+            if len(values) > 1:
+                grid, density = self.binned_kde(values)
+                ax.plot(grid, density * len(values) * (edges[1] - edges[0]), color='blue')
+            self.annotate_reduction(ax, f'Large-data mode: {len(values):,} values, '
+                                        f'binned KDE on {self.KDE_GRID_SIZE} points')
+        else:
+            sns.histplot(self.df[col], bins=bins, ax=ax, kde=True, color='blue')
         
         ax.set_title(f'Distribution of "{col}"', fontsize=20)
         ax.set_xlabel(f'{col}', fontsize=16)
@@ -110,23 +372,59 @@ class Visualization:
             ax: The axes to plot on.
             col: The column name for which to create the pie chart.
         """
-        value_counts = self.df[col].value_counts()
+        value_counts = self.value_counts(col)
         
         ax.pie(value_counts, labels=value_counts.index, autopct='%1.1f%%', startangle=90, colors=sns.color_palette("Paired"))
         ax.axis('equal')
 
         ax.set_title(f'Pie Chart of "{col}"', fontsize=20)
 
-    def scatter_plot(self, ax, x_col, y_col):
+    def stratified_sample(self, x_col, y_col, n_points=SCATTER_SAMPLE_SIZE, grid=50):
         """
-        Scatter plot for numerical columns.
+        Downsamples the rows to about `n_points`, stratified on a grid over the two columns so that
+        sparse regions and outliers keep at least one point per occupied cell.
+
+        Args:
+            x_col: The column name for the x-axis.
+            y_col: The column name for the y-axis.
+            n_points: Approximate number of rows to keep.
+            grid: Number of strata along each axis.
+
+        Returns:
+            DataFrame with the sampled x and y columns.
+        """
+        data = self.df[[x_col, y_col]].dropna()
+        frac = min(1.0, n_points / max(len(data), 1))
+        cells = (pd.cut(data[x_col], grid, labels=False).astype(int) * grid
+                 + pd.cut(data[y_col], grid, labels=False).astype(int))
+        sampled = data.groupby(cells, group_keys=False).sample(frac=frac, random_state=42)
+        first_per_cell = data.groupby(cells, group_keys=False).head(1)
+        return pd.concat([sampled, first_per_cell[~first_per_cell.index.isin(sampled.index)]])
+
+    def scatter_plot(self, ax, x_col, y_col, reduction='hexbin'):
+        """
+        Scatter plot for numerical columns. Above the large-data threshold the points are either
+        aggregated into hexagonal bins or downsampled with stratification.
 
         Args:
             ax: The axes to plot on.
             x_col: The column name for the x-axis.
             y_col: The column name for the y-axis.
+            reduction: Large-data method, 'hexbin' or 'sample'.
         """
-        sns.scatterplot(data=self.df, x=x_col, y=y_col, ax=ax, alpha=0.6)
+        n_rows = len(self.df)
+        if n_rows > self.large_data_threshold and reduction == 'hexbin':
+            data = self.df[[x_col, y_col]].dropna()
+            hexbin = ax.hexbin(data[x_col], data[y_col], gridsize=80, bins='log', cmap='viridis', mincnt=1)
+            plt.colorbar(hexbin, ax=ax, label='Count (log)')
+            self.annotate_reduction(ax, f'Large-data mode: {len(data):,} rows aggregated into hexagonal bins')
+        elif n_rows > self.large_data_threshold:
+            sample = self.stratified_sample(x_col, y_col)
+            sns.scatterplot(data=sample, x=x_col, y=y_col, ax=ax, alpha=0.6)
+            self.annotate_reduction(ax, f'Large-data mode: stratified sample of {len(sample):,} '
+                                        f'of {n_rows:,} rows')
+        else:
+            sns.scatterplot(data=self.df, x=x_col, y=y_col, ax=ax, alpha=0.6)
 
         ax.set_title(f'Scatter Plot: {y_col} vs. {x_col}', fontsize=15)
         ax.set_xlabel(f'{x_col}', fontsize=12)
@@ -141,14 +439,13 @@ class Visualization:
             value_cols: List of column names for the values to plot.
             fig_size: Tuple for figure size.
         """
-        self.df[date_col] = pd.to_datetime(self.df[date_col], errors='coerce') 
-        self.df['year'] = self.df[date_col].dt.year
+        yearly_sums = self.yearly_sums(date_col, value_cols)
 
         n_col = len(value_cols)
         fig, axes = plt.subplots(1, n_col, figsize=fig_size)
 
         for ax, col in zip(axes, value_cols):
-            time_series_data = self.df.groupby('year')[col].sum().reset_index()
+            time_series_data = yearly_sums[col].reset_index()
             sns.lineplot(data=time_series_data, x='year', y=col, ax=ax, marker='o')
 
             ax.set_title(f'Time Series of "{col}" Over Years', fontsize=15)
@@ -159,17 +456,95 @@ class Visualization:
         plt.show()
 
 
-    def word_cloud(self, ax, text_col):
+    def token_fingerprint(self, text_col, max_terms, stopwords):
+        """
+        Fingerprint of a token frequency table: changes whenever the text column, the number of kept
+        tokens or the stopwords change.
+
+        Args:
+            text_col: The column name of the text.
+            max_terms: Number of most frequent tokens kept.
+            stopwords: Set of words to ignore.
+        """
+        digest = hashlib.sha256(pd.util.hash_pandas_object(self.df[text_col], index=False).values.tobytes())
+        digest.update(f'{text_col}|{max_terms}|{"|".join(sorted(stopwords))}'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def token_frequencies(self, text_col, chunk_size=50_000, max_terms=50_000, n_jobs=1, cache_path=None,
+                          stopwords=STOPWORDS):
+        """
+        Token frequencies of a text column, counted chunk by chunk (optionally in a process pool) into
+        a counter bounded to the `max_terms` most frequent tokens. The result is cached on the instance
+        and, if `cache_path` is given, persisted as a CSV that later calls load instead of re-counting,
+        as long as the fingerprint stored next to it still matches the data and settings.
+
+        Args:
+            text_col: The column name of the text.
+            chunk_size: Number of rows tokenized per chunk.
+            max_terms: Number of most frequent tokens kept.
+            n_jobs: Number of worker processes; 1 counts in the current process. At most 2 * n_jobs
+                chunks are in flight at a time.
+            cache_path: Optional CSV path to persist the frequency table to.
+            stopwords: Set of words to ignore.
+
+        Returns:
+            Dictionary of token to count.
+        """
+        def merge(counts, chunk_count):
+            counts.update(chunk_count)
+            if len(counts) > 2 * max_terms:
+                counts = Counter(dict(counts.most_common(max_terms)))
+            return counts
+
+        def compute():
+            fingerprint = self.token_fingerprint(text_col, max_terms, stopwords) if cache_path else None
+            fingerprint_path = f'{cache_path}.json'
+            if cache_path and os.path.exists(cache_path) and os.path.exists(fingerprint_path):
+                with open(fingerprint_path) as fingerprint_file:
+                    if json.load(fingerprint_file).get('fingerprint') == fingerprint:
+                        table = pd.read_csv(cache_path, keep_default_na=False)
+                        return dict(zip(table['token'], table['count']))
+
+            texts = self.df[text_col].dropna().astype(str)
+            chunks = (texts.iloc[start:start + chunk_size].tolist() for start in range(0, len(texts), chunk_size))
+            counts = Counter()
+            if n_jobs > 1:
+                with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+                    pending = deque()
+                    for chunk in chunks:
+                        pending.append(executor.submit(_count_tokens, chunk, stopwords))
+                        if len(pending) >= 2 * n_jobs:
+                            counts = merge(counts, pending.popleft().result())
+                    while pending:
+                        counts = merge(counts, pending.popleft().result())
+            else:
+                for chunk in chunks:
+                    counts = merge(counts, _count_tokens(chunk, stopwords))
+            frequencies = dict(counts.most_common(max_terms))
+
+            if cache_path:
+                pd.DataFrame({'token': list(frequencies), 'count': list(frequencies.values())}).to_csv(
+                    cache_path, index=False)
+                with open(fingerprint_path, 'w') as fingerprint_file:
+                    json.dump({'fingerprint': fingerprint}, fingerprint_file)
+            return frequencies
+
+        stopwords_key = hashlib.sha256('|'.join(sorted(stopwords)).encode('utf-8')).hexdigest()
+        return self.cached_aggregate(('token_frequencies', text_col, max_terms, stopwords_key), compute)
+
+    def word_cloud(self, ax, text_col, n_jobs=1, cache_path=None):
         """
         Generates a word cloud from a specified text column.
 
         Args:
             ax: The axes to plot on.
             text_col: The column name from which to generate the word cloud.
+            n_jobs: Number of worker processes used to count the tokens.
+            cache_path: Optional CSV path to persist the token frequencies to.
         """
-        text = ' '.join(self.df[text_col].dropna())
+        frequencies = self.token_frequencies(text_col, n_jobs=n_jobs, cache_path=cache_path)
 
-        wordcloud = WordCloud(width=1000, height=600, background_color='white').generate(text)
+        wordcloud = WordCloud(width=1000, height=600, background_color='white').generate_from_frequencies(frequencies)
 
         ax.imshow(wordcloud, interpolation='bilinear')
         ax.axis('off')
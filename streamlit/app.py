@@ -1,21 +1,31 @@
 import streamlit as st
 import pandas as pd
-from tensorflow.keras.models import load_model
-import joblib
 import numpy as np
 import plotly.graph_objects as go
-
-monthly_model = load_model("./models/time_series/lstm_model_monthly.h5")
-weekly_model = load_model("./models/time_series/lstm_model_weekly.h5")
-daily_model = load_model("./models/time_series/lstm_model_daily.h5")
-
-monthly_scaler = joblib.load("./models/time_series/scaler_monthly.pkl")
-weekly_scaler = joblib.load("./models/time_series/scaler_weekly.pkl")
-daily_scaler = joblib.load("./models/time_series/scaler_daily.pkl")
-
-monthly_dates = pd.read_csv("./data/synthetic_monthly_dates.csv")
-weekly_dates = pd.read_csv("./data/synthetic_weekly_dates.csv")
-daily_dates = pd.read_csv("./data/synthetic_daily_dates.csv")
+import json
+import urllib.request
+import urllib.error
+import sys
+import os
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import helper.constants as CNT
+
+# Predictions come from the forecasting service (scripts/forecast_server.py), which holds the LSTM
+# models once for every dashboard session.
+FORECAST_SERVER_URL = os.environ.get("FORECAST_SERVER_URL", CNT.FORECAST_SERVER_URL)
+
+# Date tables and forecast plots are loaded lazily for the selected interval only,
+# and cached across reruns and sessions so widget interactions don't reload them.
+@st.cache_data
+def get_dates(interval):
+    # cache_data hands every rerun its own copy, so adding the predictions column is safe
+    return pd.read_csv(f"./data/synthetic_{interval}_dates.csv")
+
+@st.cache_data
+def get_forecast_html(interval):
+    with open(f"./images/lstm_{interval}_forecast.html", "r") as html_file:
+        return html_file.read()
 
 st.title("Time Series Forecasting with LSTM")
 st.sidebar.header("Choose Forecasting Type")
@@ -37,48 +47,56 @@ forecast_type = st.sidebar.radio(
 
 if forecast_type == "Monthly":
     st.subheader("Monthly Forecast")
-    model = monthly_model
-    scaler = monthly_scaler
-    dates = monthly_dates
+    dates = get_dates("monthly")
     future_steps = 12
     ts = 12
     last_sequence = np.zeros((ts, 1))
-    st.components.v1.html(open("./images/lstm_monthly_forecast.html", "r").read(), height=400, width=850)
+    interval = "monthly"
+    st.components.v1.html(get_forecast_html("monthly"), height=400, width=850)
     st.write("Forecasting for the **next 12 months** starting from the last date in the training data.")
 elif forecast_type == "Weekly":
     st.subheader("Weekly Forecast")
-    model = weekly_model
-    scaler = weekly_scaler
-    dates = weekly_dates
+    dates = get_dates("weekly")
     future_steps = 52
     ts = 7
     last_sequence = np.zeros((ts, 1))
-    st.components.v1.html(open("./images/lstm_weekly_forecast.html", "r").read(), height=400, width=850)
+    interval = "weekly"
+    st.components.v1.html(get_forecast_html("weekly"), height=400, width=850)
 
     st.write("Forecasting for the **next 52 weeks** starting from the last date in the training data.")
 # elif forecast_type == "Daily":
 #     st.subheader("Daily Forecast")
 #     st.write("Forecasting for the **next 365 days** starting from the last date in the training data.")
-#     model = daily_model
-#     scaler = daily_scaler
-#     dates = daily_dates
+#     dates = get_dates("daily")
 #     future_steps = 365
 #     ts = 30
 #     last_sequence = np.zeros((ts, 1))
-#     st.components.v1.html(open("./images/lstm_daily_forecast.html", "r").read(), height=400, width=850)
-
-def predict_future(model, scaler, last_sequence, future_steps, ts):
-    future_predictions = []
-    for _ in range(future_steps):
-        next_pred = model.predict(last_sequence.reshape(1, ts, 1))[0]
-        future_predictions.append(next_pred)
-        last_sequence = np.append(last_sequence[1:], next_pred).reshape(ts, 1)
-
-    future_predictions = scaler.inverse_transform(np.array(future_predictions).reshape(-1, 1))
-    return future_predictions
+#     interval = "daily"
+#     st.components.v1.html(get_forecast_html("daily"), height=400, width=850)
+
+def predict_future(interval, last_sequence, future_steps):
+    payload = json.dumps({
+        "window": last_sequence.reshape(-1).tolist(),
+        "horizon": future_steps,
+        "scaled": True,
+    }).encode("utf-8")
+    request = urllib.request.Request(
+        f"{FORECAST_SERVER_URL}/forecast/{interval}",
+        data=payload,
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        future_predictions = json.loads(response.read())["predictions"]
+    return np.array(future_predictions).reshape(-1, 1)
 
+predictions = None
 if st.sidebar.button("Predict"):
-    predictions = predict_future(model, scaler, last_sequence, future_steps, ts)
+    try:
+        predictions = predict_future(interval, last_sequence, future_steps)
+    except (urllib.error.URLError, OSError) as e:
+        st.error(f"The forecasting service at {FORECAST_SERVER_URL} is not reachable: {e}")
+
+if predictions is not None:
     dates["Predictions"] = predictions
 
     dates["Predictions"] = dates["Predictions"].apply(lambda x: int(round(x)))